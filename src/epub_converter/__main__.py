@@ -41,6 +41,12 @@ def main():
                        help='Skip image processing and only generate HTML and static files.')
     parser.add_argument('--cover-only', action='store_true',
                        help='Only generate cover.avif next to each EPUB and exit (no HTML changes).')
+    parser.add_argument('--centralize', action='store_true',
+                       help='Use root-level images/ and static/ folders even when the directory contains a single EPUB.')
+    parser.add_argument('--debug', action='store_true',
+                       help='Print full tracebacks for failed conversions and malformed-markup diagnostics.')
+    parser.add_argument('--executor', choices=('auto', 'threads', 'processes'), default='auto',
+                       help='Parallel backend: threads, worker processes, or auto (threads only on free-threaded Python; default: auto).')
     args = parser.parse_args()
 
     # Detect Python version and threading capabilities
@@ -90,14 +96,8 @@ def main():
             print(f"      Error: {e}")
             print("      Windows users: Download libvips binaries from:")
             print("         https://libvips.github.io/libvips/install.html")
-            print("      Or uninstall pyvips to use Pillow fallback:")
-            print("         pip uninstall pyvips")
     except ImportError:
-        try:
-            import PIL
-            print("   pyvips not available (using Pillow)")
-        except ImportError:
-            print("   No image processing library available!")
+        print("   pyvips not available (required: pip install pyvips)")
     # Check for selectolax
     try:
         import selectolax
@@ -116,18 +116,20 @@ def main():
     print("   Pre-compiled regex patterns")
     print("   Optimized image analysis with sampling")
     
-    if python_info['free_threading']:
+    if args.executor == 'processes':
+        print("   ProcessPoolExecutor (--executor processes)")
+    elif python_info['free_threading']:
+        # The converter caps threads at 2x CPU count (or EPUB_MAX_WORKERS) and
+        # prints the worker count it actually uses
         print("   ThreadPoolExecutor optimized for no-GIL")
-        # Increase default workers for free-threading
-        if args.max_workers == 100:
-            args.max_workers = min(200, os.cpu_count() * 8)
-            print(f"   Auto-adjusted max_workers to {args.max_workers} for free-threading")
+    elif args.executor == 'threads':
+        print("   ThreadPoolExecutor (--executor threads)")
     else:
         print("   ProcessPoolExecutor (GIL-limited)")
     
     print()
 
-    converter = EPUBConverter(args.epub_path, args.output_dir, args.css, no_script=args.no_script, no_image=args.no_image)
+    converter = EPUBConverter(args.epub_path, args.output_dir, args.css, no_script=args.no_script, no_image=args.no_image, debug=args.debug, centralize=args.centralize, executor=args.executor)
     converter.convert(max_workers=args.max_workers)
 
 if __name__ == "__main__":
@@ -5,46 +5,244 @@ import shutil
 import tempfile
 import time
 import sys
+import traceback
+import zlib
 import cProfile
 import pstats
+import multiprocessing
+from dataclasses import dataclass, field, fields, asdict
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 from urllib.parse import unquote, quote
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from jinja2 import Environment, FileSystemLoader
 
+import json
+
 # Try to import orjson for faster JSON operations, fallback to stdlib json
 try:
-    import orjson as json
+    import orjson
     HAS_ORJSON = True
 except ImportError:
-    import json
     HAS_ORJSON = False
 
-# Try to import selectolax for faster HTML parsing
+# Try to import selectolax for faster HTML parsing, preferring the Lexbor backend
+# (the Modest backend raises ImportError from selectolax 1.0 on)
 try:
-    from selectolax.parser import HTMLParser
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
     HAS_SELECTOLAX = True
 except ImportError:
-    HAS_SELECTOLAX = False
+    try:
+        from selectolax.parser import HTMLParser
+        HAS_SELECTOLAX = True
+    except ImportError:
+        HAS_SELECTOLAX = False
 
 from .parser import EPUBParser
-from .image import ImageProcessor
+from .image import ImageProcessor, image_digest
+
+@dataclass(slots=True)
+class FrontendMetadata:
+    """Metadata fields exposed to the frontend JavaScript (serialized into #app-data).
+
+    content_id_mapping is deliberately left out: the frontend doesn't need it
+    and it contains EPUB internal structure (OEBPS paths, etc.)
+    """
+    title: Optional[str] = None
+    author: Optional[str] = None
+    publisher: Optional[str] = None
+    date: Optional[str] = None
+    description: Optional[str] = None
+    subject: list = field(default_factory=list)
+    language: Optional[str] = None
+    cover_image_url: Optional[str] = None
+    epub_filename: Optional[str] = None
+    epub_filename_base: Optional[str] = None
+    epub_filename_base_url: Optional[str] = None
+    epub_filename_cdn_base_url: Optional[str] = None
+    toc: list = field(default_factory=list)
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        """Pick the frontend fields out of the full metadata dict; missing keys get the defaults."""
+        return cls(**{name: metadata[name] for name in _FRONTEND_METADATA_NAMES if name in metadata})
+
+_FRONTEND_METADATA_NAMES = tuple(f.name for f in fields(FrontendMetadata))
+
+# Bundled frontend assets (reader template, stylesheet, script)
+_ASSETS_DIR = Path(__file__).resolve().parent / "assets"
+_CSS_SRC = _ASSETS_DIR / "style.css"
+_JS_SRC = _ASSETS_DIR / "script.js"
+
+# Fewest chapters worth forking a chapter pool for; smaller books stay on threads,
+# where the fork and IPC overhead would outweigh the parallel regex work
+_PROCESS_POOL_MIN_CHAPTERS = 16
+
+# Minified static assets as (original chars, minified chars, UTF-8 bytes), keyed on
+# (source path, mtime, size); shared by every conversion in the process
+_minified_asset_cache = {}
+
+def _write_file_bytes(path, data):
+    """Write bytes to path with raw os.write calls (no buffered/text file object)."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        _write_fd(fd, data)
+    finally:
+        os.close(fd)
+
+def _write_fd(fd, data):
+    """Write all of data to an open file descriptor, retrying on short writes."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+def _path_name(path):
+    """Final component of a path string (like Path.name, '/' or '\\' separated) without building a Path."""
+    path = path.rstrip('/\\')
+    return path[max(path.rfind('/'), path.rfind('\\')) + 1:]
+
+def _path_stem(name):
+    """Strip the last suffix from a file name, with the same rules as Path.stem."""
+    i = name.rfind('.')
+    return name[:i] if 0 < i < len(name) - 1 else name
+
+# Characters allowed in a URL scheme (case-insensitive), e.g. "data", "https", "svn+ssh"
+_URL_SCHEME_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.+-'
+
+def _is_absolute_url(url):
+    """True for scheme-prefixed (data:, http:, ...) or protocol-relative (//...) URLs.
+
+    Same test as the regex ^(?:[a-z0-9.+-]+:|//) without running the regex engine.
+    """
+    if url.startswith('//'):
+        return True
+    colon = url.find(':')
+    return colon > 0 and not url[:colon].strip(_URL_SCHEME_CHARS)
+
+@lru_cache(maxsize=4096)
+def _unquote_cached(path):
+    """unquote() for href paths, which repeat across TOC entries and books."""
+    return unquote(path)
+
+# Characters around which whitespace can always be dropped by the fallback minifiers
+_CSS_TIGHT_CHARS = frozenset('{}:;,>')
+_JS_TIGHT_CHARS = frozenset('{}()[],;:=<>!&|?*%^~')
+# After one of these (or at the start), a '/' in JS opens a regex literal rather than dividing
+_JS_REGEX_PRECEDERS = frozenset('(,=:[!&|?{};+-*%<>~^')
+_WHITESPACE_CHARS = frozenset(' \t\n\r\f\v')
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch in '_$' or ord(ch) > 127
+
+def _minify_scan(text, tight_chars, js=False):
+    """Single-pass comment and whitespace stripper used when rcssmin/rjsmin are missing.
+
+    Copies string literals (and, for JS, regex literals) verbatim, drops comments,
+    collapses whitespace runs and removes them entirely next to tight_chars.
+    """
+    out = []
+    i = 0
+    n = len(text)
+    pending_space = False
+    last = ''  # last significant character written
+
+    def emit(token):
+        nonlocal pending_space, last
+        if pending_space and last:
+            first = token[0]
+            if not (last in tight_chars or first in tight_chars) or (js and last == first and last in '+-'):
+                out.append(' ')
+        pending_space = False
+        out.append(token)
+        last = token[-1]
+
+    while i < n:
+        ch = text[i]
+
+        if ch in _WHITESPACE_CHARS:
+            pending_space = True
+            i += 1
+            continue
+
+        if ch == '/' and i + 1 < n:
+            nxt = text[i + 1]
+            if nxt == '*':
+                end = text.find('*/', i + 2)
+                i = n if end == -1 else end + 2
+                # A comment still separates tokens in JS; in CSS it is simply removed
+                pending_space = pending_space or js
+                continue
+            if js and nxt == '/':
+                end = text.find('\n', i + 2)
+                i = n if end == -1 else end
+                continue
+
+        if ch in '"\'' or (js and ch == '`') or (js and ch == '/' and (not last or last in _JS_REGEX_PRECEDERS)):
+            # String / template / regex literal: copy through to the matching unescaped delimiter
+            end = i + 1
+            in_class = False
+            while end < n:
+                c = text[end]
+                if c == '\\':
+                    end += 2
+                    continue
+                if ch == '/':
+                    if c == '[':
+                        in_class = True
+                    elif c == ']':
+                        in_class = False
+                    elif c == '/' and not in_class:
+                        break
+                    elif c == '\n':
+                        break
+                elif c == ch:
+                    break
+                end += 1
+            emit(text[i:end + 1])
+            i = end + 1
+            continue
+
+        # Plain run: consume up to the next character that needs special handling
+        end = i + 1
+        if _is_word_char(ch):
+            while end < n and _is_word_char(text[end]):
+                end += 1
+        emit(text[i:end])
+        i = end
+
+    return ''.join(out)
 
 class EPUBConverter:
-    def __init__(self, epub_path, output_folder=None, custom_css_path=None, no_script=False, no_image=False):
+    _patterns_compiled = False
+
+    def __init__(self, epub_path, output_folder=None, custom_css_path=None, no_script=False, no_image=False, debug=False, centralize=False, executor='auto'):
         self.epub_path = Path(epub_path)
         self.output_folder = Path(output_folder) if output_folder else self.epub_path.parent
         self.custom_css_path = custom_css_path
         self.no_script = no_script
         self.no_image = no_image
+        # Print full tracebacks for failed conversions (--debug)
+        self.debug = debug
+        # Use central images/static folders even for a directory holding one EPUB (--centralize)
+        self.centralize = centralize
+        # Parallel backend: 'threads', 'processes', or 'auto' (threads only when free-threaded)
+        self.executor = executor
         self.temp_dir = None
         self.image_processor = ImageProcessor()
         
-        # Central images folder for directory conversions
+        # Central images/static folders for directory conversions
         self.central_images_folder = None
+        self.central_static_folder = None
+        
+        # Last ETA shown in progress output, keyed on its whole-second value
+        self._last_eta_bucket = -1
+        self._last_eta_str = ''
         
-        assets_path = Path(__file__).parent / "assets"
-        self.jinja_env = Environment(loader=FileSystemLoader(assets_path))
+        # Assets don't change during a run, so skip Jinja's per-lookup uptodate check
+        self.jinja_env = Environment(loader=FileSystemLoader(_ASSETS_DIR), auto_reload=False)
+        # Compiled reader template, loaded on first render or warmed before forking workers
+        self._reader_template = None
         
         # Detect free-threading capabilities
         self.free_threading = self._detect_free_threading()
@@ -73,6 +271,14 @@ class EPUBConverter:
         import os
         return os.environ.get('PYTHON_GIL') == '0'
 
+    def _use_threads(self):
+        """Whether parallel conversion runs on threads rather than worker processes."""
+        if self.executor == 'threads':
+            return True
+        if self.executor == 'processes':
+            return False
+        return self.free_threading
+
     def _start_profiling(self):
         """Start performance profiling if enabled."""
         if self.profile_enabled:
@@ -112,160 +318,176 @@ class EPUBConverter:
         if completed == 0:
             return "Unknown"
         
-        elapsed = time.time() - start_time
+        elapsed = time.monotonic() - start_time
         rate = completed / elapsed
         remaining = (total - completed) / rate
-        return self._format_time(remaining)
-
-    def _compile_regex_patterns(self):
-        """Pre-compile all regex patterns for better performance."""
+        # Progress lines arrive far faster than once a second; reuse the last
+        # formatted string while the whole-second estimate hasn't changed
+        bucket = int(remaining)
+        if bucket != self._last_eta_bucket:
+            self._last_eta_bucket = bucket
+            self._last_eta_str = self._format_time(remaining)
+        return self._last_eta_str
+
+    @classmethod
+    def _compile_regex_patterns(cls):
+        """Pre-compile all regex patterns for better performance.
+
+        Patterns are stored on the class, so they are compiled once per process
+        (and inherited by forked workers) rather than once per instance.
+        """
+        if cls._patterns_compiled:
+            return
+        
         # Body content extraction patterns
-        self.body_pattern = re.compile(r'<body[^>]*>(.*?)</body>', re.DOTALL | re.IGNORECASE)
-        self.html_pattern = re.compile(r'<html[^>]*>(.*?)</html>', re.DOTALL | re.IGNORECASE)
-        self.head_pattern = re.compile(r'<head>.*?</head>', re.DOTALL | re.IGNORECASE)
-        self.xml_declaration_pattern = re.compile(r'<?xml[^>]*?>')
-        self.doctype_pattern = re.compile(r'<!DOCTYPE[^>]*>')
+        # Open and close tags are searched separately and the content between them is
+        # sliced out: same result as one '<body[^>]*>(.*?)</body>' DOTALL search, but
+        # without the lazy .*? stepping through the chapter one character at a time
+        cls.body_open_pattern = re.compile(r'<body[^>]*>', re.IGNORECASE)
+        cls.body_close_pattern = re.compile(r'</body>', re.IGNORECASE)
+        cls.html_open_pattern = re.compile(r'<html[^>]*>', re.IGNORECASE)
+        cls.html_close_pattern = re.compile(r'</html>', re.IGNORECASE)
+        cls.head_pattern = re.compile(r'<head>.*?</head>', re.DOTALL | re.IGNORECASE)
+        cls.xml_declaration_pattern = re.compile(r'<?xml[^>]*?>')
+        cls.doctype_pattern = re.compile(r'<!DOCTYPE[^>]*>')
         
         # Image processing patterns
-        self.img_tag_pattern = re.compile(r'<img\b[^>]+>', re.IGNORECASE | re.DOTALL)
-        self.img_src_pattern = re.compile(r'(<img\b[^>]*\ssrc\s*=\s*)(["\'])(.*?)\2', re.IGNORECASE | re.DOTALL)
-        self.img_alt_pattern = re.compile(r'\salt\s*=\s*(["\'])(.*?)\1', re.IGNORECASE)
-        self.img_src_extract_pattern = re.compile(r'src\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
-        self.img_close_pattern = re.compile(r'(\s*)(>)', re.IGNORECASE)
+        cls.img_src_pattern = re.compile(r'(<img\b[^>]*\ssrc\s*=\s*)(["\'])(.*?)\2', re.IGNORECASE | re.DOTALL)
+        cls.img_alt_pattern = re.compile(r'\salt\s*=\s*(["\'])(.*?)\1', re.IGNORECASE)
+        cls.img_src_extract_pattern = re.compile(r'src\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+        cls.img_close_pattern = re.compile(r'(\s*)(>)', re.IGNORECASE)
+        # Bytes variants for scanning undecoded chapter files (cover detection, --no-image mapping)
+        cls.img_src_bytes_pattern = re.compile(rb'<img[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
+        cls.img_src_extract_bytes_pattern = re.compile(rb'src\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
         
         # Link processing patterns
-        self.link_href_pattern = re.compile(r'(<a\b[^>]*\shref\s*=\s*)(["\'])(.*?)\2', re.IGNORECASE | re.DOTALL)
+        cls.link_href_pattern = re.compile(r'(<a\b[^>]*\shref\s*=\s*)(["\'])(.*?)\2', re.IGNORECASE | re.DOTALL)
         
-        # URL patterns
-        self.data_url_pattern = re.compile(r'^(?:[a-z0-9.+-]+:|//)', re.IGNORECASE)
-        self.static_url_pattern = re.compile(r'^./static')
+        # Malformed <span (missing >) detection for --debug output, and the fix-up
+        cls.malformed_span_pattern = re.compile(r'<span\s+[^<>]{10,50}')
+        cls.malformed_span_fix_pattern = re.compile(r'<span\s+(?![a-zA-Z0-9_:-]+=)([^>]+?)')
         
-        # CSS minification patterns
-        self.css_comment_pattern = re.compile(r'/\*.*?\*/', re.DOTALL)
-        self.css_whitespace_pattern = re.compile(r'\s+')
+        # Opening/closing anchor tags, scanned by _fix_fake_anchors
+        cls.anchor_tag_pattern = re.compile(r'</?a\b[^>]*>', re.IGNORECASE)
         
-        # JS minification patterns
-        self.js_line_comment_pattern = re.compile(r'(?<!:)//.*?$', re.MULTILINE)
-        self.js_block_comment_pattern = re.compile(r'/\*.*?\*/', re.DOTALL)
-        self.js_whitespace_pattern = re.compile(r'\s+')
+        # HTML minification patterns
+        cls.html_comment_pattern = re.compile(r'<!--(?!\[if\s).*?-->', re.DOTALL)
+        cls.whitespace_pattern = re.compile(r'\s+')
         
-        # SVG pattern for detecting and replacing SVG elements containing images
-        self.svg_pattern = re.compile(r'<svg[^>]*>.*?</svg>', re.DOTALL | re.IGNORECASE)
+        # Chapter tags rewritten in a single pass: <img> tags and h1 open/close (h1 -> h2),
+        # plus whole SVG elements on the first page (SVG covers are replaced with an <img>)
+        cls.body_tag_pattern = re.compile(r'<img\b[^>]+>|<h1\b|</h1>', re.IGNORECASE)
+        cls.first_page_tag_pattern = re.compile(r'<svg[^>]*>.*?</svg>|<img\b[^>]+>|<h1\b|</h1>', re.DOTALL | re.IGNORECASE)
+        # href/xlink:href attributes inside an SVG (cover <image> detection)
+        cls.svg_href_pattern = re.compile(r'(href|xlink:href)\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
         
-        # H1 to H2 conversion patterns
-        self.h1_open_pattern = re.compile(r'<h1\b', re.IGNORECASE)
-        self.h1_close_pattern = re.compile(r'</h1>', re.IGNORECASE)
+        cls._patterns_compiled = True
 
     def _fix_fake_anchors(self, content):
         """
         Convert <a> tags without href attribute to <span> tags.
         This fixes styling issues where anchors are styled but don't link anywhere.
         """
-        # Optimized regex approach:
-        # 1. Replace opening <a ...> that has no href with <span ...>
-        # We look for <a followed by anything that doesn't contain "href=" or "href =" until the closing >
-        # This is a bit complex to do perfectly with regex, but we can approximate safely.
-        
-        # Pattern: <a (attributes without href) >
-        # We use a negative lookahead to ensure 'href' is not in the attributes
+        # Most text-only chapters have no anchors at all; a substring test is far cheaper
+        # than the case-insensitive regex scan below
+        if '<a' not in content and '<A' not in content:
+            return content
         
-        # Note: If selectolax is used, this method might not be needed or called on already fixed content.
-        # But we keep it for the regex fallback path.
+        # Single scan over opening/closing anchor tags. Each opening tag records on a
+        # stack whether it became a <span>, so its closing tag is rewritten to match.
+        # Only the tag prefixes change; everything in between is copied as slices.
+        parts = []
+        stack = []
+        last = 0
         
-        def replace_tag(match):
+        for match in self.anchor_tag_pattern.finditer(content):
             tag = match.group(0)
-            if 'href=' in tag.lower() or 'href =' in tag.lower():
-                return tag
-            return tag.replace('<a', '<span', 1).replace('<A', '<span', 1)
+            start = match.start()
             
-        # Replace opening tags
-        content = re.sub(r'<a\b[^>]*>', replace_tag, content, flags=re.IGNORECASE)
-        
-        # For closing tags, we can't easily know which one matches a converted <span> vs a real <a>.
-        # However, standard HTML parsers/browsers are lenient. 
-        # If we have nested <a> tags (invalid), this is hard.
-        # But for valid HTML, we can try to match pairs.
-        
-        # Actually, the previous token-based approach was robust but slow.
-        # Let's stick to the token-based approach but optimize it slightly
-        # or rely on selectolax which we enabled.
-        
-        # If we are here, it means we are likely using the regex extraction method.
-        # Let's use a simplified regex replacement that assumes no nested anchors.
-        
-        # Find all <a> tags without href and replace them and their closing tags?
-        # No, that's hard.
+            if tag[1] == '/':
+                if stack and stack.pop():
+                    parts.append(content[last:start])
+                    parts.append('</span>')
+                    last = match.end()
+                continue
+            
+            lowered = tag.lower()
+            is_fake = 'href=' not in lowered and 'href =' not in lowered
+            # XHTML self-closing anchors (<a id="p1"/>) have no closing tag to pair with
+            if not tag.endswith('/>'):
+                stack.append(is_fake)
+            if is_fake:
+                parts.append(content[last:start])
+                parts.append('<span')
+                last = start + 2
         
-        # Let's keep the token approach but optimize the split/join
-        # It's actually not that slow compared to parsing.
+        if not parts:
+            return content
+        parts.append(content[last:])
+        return "".join(parts)
+
+    def _build_path_index(self, path_mapping, image_metadata=None, metadata=None):
+        """Build the fallback lookup tables used when resolving chapter image paths.
+
+        Each table keeps the first mapping entry for a key, matching what a linear
+        scan over path_mapping/image_metadata in insertion order would find. The
+        cover's file name and mapped path are resolved here too, once per book.
+        """
+        by_name = {}
+        by_lower = {}
+        by_part = {}
+        for key, value in path_mapping.items():
+            key_path = Path(key)
+            by_name.setdefault(key_path.name, value)
+            by_lower.setdefault(key.lower(), value)
+            for part in key_path.parts:
+                by_part.setdefault(part, value)
         
-        # Tokenize by anchor tags
-        tokens = re.split(r'(</?a\b[^>]*>)', content, flags=re.IGNORECASE)
+        image_by_name = {}
+        for key, info in (image_metadata or {}).items():
+            image_by_name.setdefault(Path(key).name, info)
         
-        result = []
-        stack = [] 
+        # path_mapping keys are relative paths; match the cover by filename
+        cover_name = None
+        if metadata and metadata.get('actual_cover_file_path'):
+            cover_name = Path(metadata['actual_cover_file_path']).name
         
-        for token in tokens:
-            if not token: continue
-            
-            if token.lower().startswith('<a'):
-                if 'href' in token.lower():
-                    result.append(token)
-                    stack.append(False)
-                else:
-                    result.append(token.replace('<a', '<span', 1).replace('<A', '<span', 1))
-                    stack.append(True)
-            elif token.lower().startswith('</a'):
-                if stack:
-                    if stack.pop():
-                        result.append('</span>')
-                    else:
-                        result.append(token)
-                else:
-                    result.append(token)
-            else:
-                result.append(token)
-                
-        return "".join(result)
+        return {
+            'by_name': by_name,
+            'by_lower': by_lower,
+            'by_part': by_part,
+            'image_by_name': image_by_name,
+            'cover_name': cover_name,
+            'cover_mapped_path': by_name.get(cover_name) if cover_name else None,
+        }
+
+    def _process_content_file(self, content_file_info, extract_dir, path_mapping, metadata=None, image_metadata=None, path_index=None):
+        """Process a single content file and return its processed body HTML.
 
-    def _process_content_file(self, content_file_info, extract_dir, path_mapping, metadata=None, image_metadata=None):
-        """Process a single content file and return the processed content."""
+        The caller wraps it in the chapter <div>; None means the file could not be processed.
+        """
         i, content_file_path = content_file_info
+        if path_index is None:
+            path_index = self._build_path_index(path_mapping, image_metadata, metadata)
         try:
-            with open(content_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            # One read of the raw bytes (no GIL held during the read) and a single decode,
+            # instead of a text-mode file object decoding chunk by chunk
+            content = content_file_path.read_bytes().decode('utf-8', 'ignore')
+            # Keep text-mode newline translation
+            if '\r' in content:
+                content = content.replace('\r\n', '\n').replace('\r', '\n')
             
             body_content = self.extract_body_content(content)
             
+            # Cover state is resolved once per book in _build_path_index
+            cover_name = path_index['cover_name']
+            cover_mapped_path = path_index['cover_mapped_path']
+            cover_name_has_cover = bool(cover_name) and 'cover' in cover_name.lower()
+            
             # For the first page, replace any SVG elements with image references with the correct cover image
             # This ensures that incorrect SVG cover images are replaced with the proper <img> tag
             if i == 1:
-                # Compile href pattern once
-                href_pattern = re.compile(r'(href|xlink:href)\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
-                
-                # Find the new cover image path from mapping
-                cover_img_src = "./cover.avif" # Fallback
-                if metadata and 'actual_cover_file_path' in metadata:
-                    actual_cover = metadata['actual_cover_file_path']
-                    if actual_cover:
-                        try:
-                            # Try to find the cover in path_mapping
-                            # We need to look up by relative path or filename
-                            # Since we don't have easy access to extract_dir here to calculate relative path exactly as in processor
-                            # We'll try to find it by filename in the mapping values or keys
-                            
-                            # Better approach: The path_mapping keys are relative paths.
-                            # We can try to match the filename.
-                            cover_path = Path(actual_cover)
-                            cover_name = cover_path.name
-                            
-                            # Look for the cover in the mapping
-                            for key, value in path_mapping.items():
-                                if Path(key).name == cover_name:
-                                    cover_img_src = value
-                                    break
-                        except Exception as e:
-                            print(f"    Warning: Error finding cover image in mapping: {e}")
+                cover_img_src = cover_mapped_path or "./cover.avif" # Fallback
 
                 def replace_svg_with_cover(match):
                     svg_content = match.group(0)
@@ -273,20 +495,12 @@ class EPUBConverter:
                     # This targets SVG cover images specifically
                     if '<image' in svg_content.lower():
                         # Check if there's an xlink:href or href with a non-data URL
-                        has_non_data_image = False
-                        matches = href_pattern.findall(svg_content)
-                        for attr_name, href_value in matches:
+                        for attr_name, href_value in self.svg_href_pattern.findall(svg_content):
                             if href_value and not href_value.startswith('data:'):
-                                has_non_data_image = True
-                                break
-                        
-                        if has_non_data_image:
-                            return f'<img alt="Cover" class="CoverImage" id="CoverImage" src="{cover_img_src}" loading="eager" fetchpriority="high" decoding="async">'
+                                return f'<img alt="Cover" class="CoverImage" id="CoverImage" src="{cover_img_src}" loading="eager" fetchpriority="high" decoding="async">'
                     
                     # If no image element or it's a data URL, return the original SVG
                     return svg_content
-                
-                body_content = self.svg_pattern.sub(replace_svg_with_cover, body_content)
 
             def replace_img_src_in_chapter(match):
                 tag_start = match.group(1)
@@ -294,37 +508,12 @@ class EPUBConverter:
                 src_val = match.group(3)
                 src = unquote(src_val)
                 
-                if src.startswith('data:') or self.data_url_pattern.match(src):
+                if _is_absolute_url(src):
                     return match.group(0)
 
-                # Check if this is the cover image - improved detection
-                is_cover = False
-                if metadata and 'actual_cover_file_path' in metadata:
-                    actual_cover = metadata['actual_cover_file_path']
-                    if actual_cover:
-                        try:
-                            cover_path = Path(actual_cover)
-                            cover_name = cover_path.name
-                            cover_stem = cover_path.stem
-                            
-                            # Multiple ways to match the cover image
-                            src_path = Path(src)
-                            src_name = src_path.name
-                            src_stem = src_path.stem
-                            
-                            # Check various matching criteria
-                            if (src.endswith(cover_name) or 
-                                src == cover_name or 
-                                cover_name in src or
-                                src_name == cover_name or
-                                src_stem == cover_stem or
-                                'cover' in src.lower() and 'cover' in cover_name.lower()):
-                                is_cover = True
-                        except Exception as e:
-                            print(f"    Warning: Error checking cover image match: {e}")
-
                 # Try multiple methods to find the image in the mapping
                 new_src = None
+                src_name = _path_name(src)
                 
                 # Method 1: Try with full path resolution
                 try:
@@ -341,7 +530,7 @@ class EPUBConverter:
                 
                 # Method 3: Try with just the filename
                 if not new_src:
-                    new_src = path_mapping.get(Path(src).name)
+                    new_src = path_mapping.get(src_name)
                 
                 # Method 4: Try with normalized path (handle Windows/Unix differences)
                 if not new_src:
@@ -350,24 +539,15 @@ class EPUBConverter:
                 
                 # Method 5: Try with just the stem (filename without extension)
                 if not new_src:
-                    new_src = path_mapping.get(Path(src).stem)
+                    new_src = path_mapping.get(_path_stem(src_name))
                 
                 # Method 6: Try case-insensitive matching
                 if not new_src:
-                    src_lower = src.lower()
-                    for key, value in path_mapping.items():
-                        if key.lower() == src_lower:
-                            new_src = value
-                            break
+                    new_src = path_index['by_lower'].get(src.lower())
                 
-                # Method 7: Try partial matching for complex paths
-                if not new_src:
-                    src_parts = Path(src).parts
-                    for key, value in path_mapping.items():
-                        key_parts = Path(key).parts
-                        if src_parts[-1] in key_parts:  # Last part matches
-                            new_src = value
-                            break
+                # Method 7: Try partial matching for complex paths (last part of src is any part of a key)
+                if not new_src and src_name:
+                    new_src = path_index['by_part'].get(src_name)
                 
                 # Use original src if still not found
                 if not new_src:
@@ -377,157 +557,103 @@ class EPUBConverter:
                 return f'{tag_start}{quote}{new_src}{quote}'
 
             def replace_img_tags(match):
-                """Replace image src and set alt attribute to filename"""
+                """Replace image src and set alt, loading, size and fallback attributes"""
                 full_img_tag = match.group(0)
-                    
-                # Check if loading attribute already exists
-                has_loading = 'loading=' in full_img_tag.lower()
+                full_img_tag_lower = full_img_tag.lower()
                 
-                # Replace src attribute first
+                # Replace src attribute first; everything below derives from the new src
                 replaced_tag = self.img_src_pattern.sub(replace_img_src_in_chapter, full_img_tag)
-                
-                # Extract the new image src to get filename for alt
                 src_match = self.img_src_extract_pattern.search(replaced_tag)
-                if src_match:
-                    image_path = src_match.group(1)
-                    image_name = Path(image_path).stem  # Get filename without extension
-                    
-                    # Remove existing alt attribute if present
+                image_path = src_match.group(1) if src_match else None
+                image_name = _path_name(image_path) if image_path is not None else None
+                
+                # Added attributes are collected and spliced in once before the closing > or />
+                new_attrs = []
+                
+                if image_path is not None:
+                    # Replace any existing alt attribute with the filename (without extension)
                     alt_match = self.img_alt_pattern.search(replaced_tag)
                     if alt_match:
-                        # Remove the existing alt attribute
                         replaced_tag = replaced_tag[:alt_match.start()] + replaced_tag[alt_match.end():]
-                    
-                    # Add new alt attribute with filename before the closing > or />
-                    if replaced_tag.endswith('/>'):
-                        replaced_tag = replaced_tag[:-2] + f' alt="{image_name}" />'
-                    elif replaced_tag.endswith('>'):
-                        replaced_tag = replaced_tag[:-1] + f' alt="{image_name}">'
+                    new_attrs.append(f'alt="{_path_stem(image_name)}"')
                 
                 # Add appropriate loading attribute if not already present
-                if not has_loading:
-                    # Check if this is the cover image
-                    src_match = self.img_src_extract_pattern.search(replaced_tag)
-                    if src_match:
-                        image_path = src_match.group(1)
-                        is_cover_image = False
-                        
+                if 'loading=' not in full_img_tag_lower:
+                    is_cover_image = False
+                    if image_path is not None:
                         # Check for explicit ID or class indicating cover
                         # The user reported id="coverimage"
-                        if 'id="coverimage"' in full_img_tag.lower() or 'class="coverimage"' in full_img_tag.lower() or 'class="cover"' in full_img_tag.lower():
+                        if 'id="coverimage"' in full_img_tag_lower or 'class="coverimage"' in full_img_tag_lower or 'class="cover"' in full_img_tag_lower:
                             is_cover_image = True
-                        
                         # Check if it matches the actual cover file path
-                        if not is_cover_image and metadata and 'actual_cover_file_path' in metadata:
-                            actual_cover = metadata['actual_cover_file_path']
-                            if actual_cover:
-                                try:
-                                    cover_path = Path(actual_cover)
-                                    cover_name = cover_path.name
-                                    
-                                    # Look for the cover image path in the mapping
-                                    cover_mapped_path = None
-                                    for key, value in path_mapping.items():
-                                        if Path(key).name == cover_name:
-                                            cover_mapped_path = value
-                                            break
-                                    
-                                    if cover_mapped_path and (image_path == cover_mapped_path or image_path.endswith(cover_mapped_path)):
-                                        is_cover_image = True
-                                    
-                                    # Fallback: check if 'cover' is in the name
-                                    if not is_cover_image and ('cover' in image_path.lower() or 'cover' in cover_name.lower()):
-                                        is_cover_image = True
-                                        
-                                except Exception as e:
-                                    print(f"    Warning: Error in cover image replacement: {e}")
-                        
-                        if is_cover_image:
-                            # Cover image should be eager-loaded for LCP
-                            # Also ensure fetchpriority="high" is added
-                            if replaced_tag.endswith('/>'):
-                                replaced_tag = replaced_tag[:-2] + ' loading="eager" fetchpriority="high" decoding="async" />'
-                            else:
-                                replaced_tag = replaced_tag[:-1] + ' loading="eager" fetchpriority="high" decoding="async">'
-                        else:
-                            # Other images should be lazy-loaded
-                            if replaced_tag.endswith('/>'):
-                                replaced_tag = replaced_tag[:-2] + ' loading="lazy" decoding="async" />'
-                            else:
-                                replaced_tag = replaced_tag[:-1] + ' loading="lazy" decoding="async">'
+                        elif cover_name:
+                            if cover_mapped_path and (image_path == cover_mapped_path or image_path.endswith(cover_mapped_path)):
+                                is_cover_image = True
+                            # Fallback: check if 'cover' is in the name
+                            elif cover_name_has_cover or 'cover' in image_path.lower():
+                                is_cover_image = True
+                    
+                    if is_cover_image:
+                        # Cover image should be eager-loaded for LCP
+                        # Also ensure fetchpriority="high" is added
+                        new_attrs.append('loading="eager" fetchpriority="high" decoding="async"')
                     else:
-                        # Fallback to lazy loading if we can't determine the image
-                        if replaced_tag.endswith('/>'):
-                            replaced_tag = replaced_tag[:-2] + ' loading="lazy" decoding="async" />'
-                        else:
-                            replaced_tag = replaced_tag[:-1] + ' loading="lazy" decoding="async">'
+                        # Other images (or ones we can't identify) should be lazy-loaded
+                        new_attrs.append('loading="lazy" decoding="async"')
                 
                 # Add width and height attributes if available in metadata
                 # This helps prevent layout shifts (CLS)
-                if image_metadata:
-                    # Extract the new src to look up metadata
-                    src_match = self.img_src_extract_pattern.search(replaced_tag)
-                    if src_match:
-                        new_src = src_match.group(1)
-                        img_info = image_metadata.get(new_src)
-                        
-                        # If not found by exact path, try filename matching
-                        if not img_info:
-                            new_src_name = Path(new_src).name
-                            for key, info in image_metadata.items():
-                                if Path(key).name == new_src_name:
-                                    img_info = info
-                                    break
-                        
-                        if img_info and 'width' in img_info and 'height' in img_info:
-                            width = img_info['width']
-                            height = img_info['height']
-                            
-                            # Check if width/height already exist
-                            has_width = 'width=' in replaced_tag.lower()
-                            has_height = 'height=' in replaced_tag.lower()
-                            
-                            if not has_width and not has_height:
-                                # Add dimensions
-                                if replaced_tag.endswith('/>'):
-                                    replaced_tag = replaced_tag[:-2] + f' width="{width}" height="{height}" />'
-                                else:
-                                    replaced_tag = replaced_tag[:-1] + f' width="{width}" height="{height}">'
+                if image_metadata and image_path is not None:
+                    img_info = image_metadata.get(image_path)
+                    
+                    # If not found by exact path, try filename matching
+                    if not img_info:
+                        img_info = path_index['image_by_name'].get(image_name)
+                    
+                    if img_info and 'width' in img_info and 'height' in img_info:
+                        # Only add dimensions if neither already exists
+                        tag_lower = replaced_tag.lower()
+                        if 'width=' not in tag_lower and 'height=' not in tag_lower:
+                            new_attrs.append(f'width="{img_info["width"]}" height="{img_info["height"]}"')
                 
                 # Add onerror attribute for CDN fallback
-                # Extract the filename from the src to construct the CDN URL
-                src_match = self.img_src_extract_pattern.search(replaced_tag)
-                if src_match:
-                    image_src = src_match.group(1)
-                    # Extract just the filename (e.g., "/images/8f7587ac-09.avif" -> "8f7587ac-09.avif")
-                    image_filename = Path(image_src).name
-                    cdn_url = f"https://images.lnori.qzz.io/{image_filename}"
-                    
-                    # Add onerror attribute before the closing tag
+                # (e.g., "/images/8f7587ac-09.avif" -> "https://images.lnori.qzz.io/8f7587ac-09.avif")
+                if image_path is not None:
+                    cdn_url = f"https://images.lnori.qzz.io/{image_name}"
+                    new_attrs.append(f'onerror="this.onerror=null; this.src=\'{cdn_url}\';"')
+                
+                if new_attrs:
+                    added = ' '.join(new_attrs)
                     if replaced_tag.endswith('/>'):
-                        replaced_tag = replaced_tag[:-2] + f' onerror="this.onerror=null; this.src=\'{cdn_url}\';" />'
-                    elif replaced_tag.endswith('>'):
-                        replaced_tag = replaced_tag[:-1] + f' onerror="this.onerror=null; this.src=\'{cdn_url}\';">'
+                        replaced_tag = f'{replaced_tag[:-2]} {added} />'
+                    else:
+                        replaced_tag = f'{replaced_tag[:-1]} {added}>'
 
                 return replaced_tag
 
+            def rewrite_tag(match):
+                tag = match.group(0)
+                kind = tag[1].lower()
+                if kind == 'i':
+                    return replace_img_tags(match)
+                # Convert all h1 tags to h2 tags so the series title h1 in the template is the only h1
+                if kind == 'h':
+                    return '<h2'
+                if kind == '/':
+                    return '</h2>'
+                # SVG (first page only): whatever it became still gets the img/h1 rewrites
+                return self.body_tag_pattern.sub(rewrite_tag, replace_svg_with_cover(match))
+
+            # One pass over the body for SVG covers, images and h1s.
             # Always process images in content to fix paths (even if --no-image flag is set)
             # This ensures the HTML has the correct image references whether images are converted or not
-            body_content = self.img_tag_pattern.sub(replace_img_tags, body_content)
-            
-            # Convert all h1 tags to h2 tags so the series title h1 in the template is the only h1
-            body_content = self.h1_open_pattern.sub('<h2', body_content)
-            body_content = self.h1_close_pattern.sub('</h2>', body_content)
+            tag_pattern = self.first_page_tag_pattern if i == 1 else self.body_tag_pattern
+            body_content = tag_pattern.sub(rewrite_tag, body_content)
 
-            result = f'''<div class="chapter" id="page{i:02d}">
-{body_content}
-</div>'''
-            
-            # DEBUG: Check for malformed spans
-            if '<span ' in result and 'xmlns=' not in result:
+            # DEBUG: Check for malformed spans (only with --debug; this is an extra full scan)
+            if self.debug and '<span ' in body_content and 'xmlns=' not in body_content:
                 # Check if it's actually malformed (has <span  followed by text without >)
-                import re as debug_re
-                malformed = debug_re.findall(r'<span\s+[^<>]{10,50}', result)
+                malformed = self.malformed_span_pattern.findall(body_content)
                 if malformed:
                     print(f"DEBUG WARNING: Page {i} has {len(malformed)} potentially malformed spans")
                     print(f"Example: {malformed[0][:80]}")
@@ -535,70 +661,136 @@ class EPUBConverter:
             # Fix malformed spans where > is missing after <span
             # This handles cases like <span Text... -> <span>Text...
             # We look for <span followed by whitespace and then non-attribute text
-            result = re.sub(r'<span\s+(?![a-zA-Z0-9_:-]+=)([^>]+?)', r'<span>\1', result)
+            if '<span' in body_content:
+                body_content = self.malformed_span_fix_pattern.sub(r'<span>\1', body_content)
             
             # Fix fake anchors (<a> without href) by converting them to <span>
-            result = self._fix_fake_anchors(result)
+            body_content = self._fix_fake_anchors(body_content)
             
-            return result
+            return body_content
         except Exception as e:
             print(f"    Warning: Could not read {content_file_path.name}: {e}")
             return None
 
-    def combine_and_generate_html(self, content_files, extract_dir, metadata, path_mapping, custom_css=None, image_metadata=None):
-        """Combine content files, embed images as base64, and generate the final HTML with UI using parallel processing."""
+    def combine_and_generate_html(self, content_files, extract_dir, metadata, path_mapping, custom_css=None, image_metadata=None, metadata_json=None, content_id_mapping=None):
+        """Combine content files, embed images as base64, and generate the final HTML with UI using parallel processing.
+
+        When content_id_mapping is given, chapter links are fixed on the combined body
+        before it is rendered into the template, so the full page is built only once.
+        """
         print(f"  Combining {len(content_files)} content files in reading order:")
         
+        # Image path fallback tables are shared by every chapter, so build them once
+        path_index = self._build_path_index(path_mapping, image_metadata, metadata)
+        
         if len(content_files) <= 3:  # For small numbers of files, process sequentially
             combined_body = []
             for i, (_, content_file_path) in enumerate(content_files, 1):
                 print(f"    {i}. {content_file_path.name}")
-                result = self._process_content_file((i, content_file_path), extract_dir, path_mapping, metadata, image_metadata)
-                if result:
-                    combined_body.append(result)
+                result = self._process_content_file((i, content_file_path), extract_dir, path_mapping, metadata, image_metadata, path_index)
+                if result is not None:
+                    combined_body.append((i, result))
         else:  # For larger numbers of files, use parallel processing
             print(f"  Processing {len(content_files)} content files in parallel...")
             combined_body = []
             
-            # Use a higher worker limit for content processing, scaling with CPU
-            # Default to at least 32 workers, or 4x CPU count
-            max_workers = max(32, (os.cpu_count() or 4) * 4)
+            # Chapter rewriting is pure-Python regex/string work, so under the GIL threads
+            # only interleave it. Fork worker processes instead for books long enough to
+            # repay the fork, unless this already is a book-level worker (those already
+            # fill the cores) or there's a single core.
+            #
+            # The pool is per book because the shared tables below are per book. By now
+            # libvips may have started its worker threads, and forking a threaded process
+            # copies any lock another thread held at that moment. The children only run
+            # Python string work and never call into libvips, so its locks are never
+            # taken there; Python reinitializes its own locks after fork.
+            mp_context = _get_fork_context()
+            process_workers = min(len(content_files), os.cpu_count() or 1)
+            chapter_args = (extract_dir, path_mapping, metadata, image_metadata, path_index)
+            use_processes = (
+                not self._use_threads()
+                and mp_context is not None
+                and process_workers > 1
+                and len(content_files) >= _PROCESS_POOL_MIN_CHAPTERS
+                and _worker_converter is None
+            )
+            if use_processes:
+                # Forked workers inherit this converter and the book's shared tables
+                # through the initializer, so only chapter arguments and results cross
+                # the process boundary
+                executor = ProcessPoolExecutor(
+                    max_workers=process_workers,
+                    mp_context=mp_context,
+                    initializer=_adopt_converter,
+                    initargs=(self, chapter_args)
+                )
+                process_fn = _process_content_in_worker
+            else:
+                # Use a higher worker limit for content processing, scaling with CPU
+                # Default to at least 32 workers, or 4x CPU count
+                max_workers = max(32, (os.cpu_count() or 4) * 4)
+                executor = ThreadPoolExecutor(max_workers=min(len(content_files), max_workers))
+
+                def process_fn(chapter):
+                    return self._process_content_file(chapter, *chapter_args)
             
-            with ThreadPoolExecutor(max_workers=min(len(content_files), max_workers)) as executor:
-                # Submit all content file processing tasks
-                future_to_file = {
-                    executor.submit(self._process_content_file, (i, content_file_path), extract_dir, path_mapping, metadata, image_metadata): (i, content_file_path)
-                    for i, (_, content_file_path) in enumerate(content_files, 1)
-                }
-                
-                # Process completed tasks as they finish
-                results = {}
-                for future in as_completed(future_to_file):
-                    i, content_file_path = future_to_file[future]
-                    try:
-                        result = future.result()
-                        if result:
-                            results[i] = result
-                            # print(f"    {i}. {content_file_path.name}") # Reduce spam
-                    except Exception as e:
-                        print(f"    Warning: Could not process {content_file_path.name}: {e}")
-                
-                # Sort results by chapter number to maintain order
-                combined_body = [results[i] for i in sorted(results.keys())]
+            chapters = [(i, content_file_path) for i, (_, content_file_path) in enumerate(content_files, 1)]
+            with executor:
+                # map yields results in chapter order, so there is nothing to re-sort
+                results = executor.map(process_fn, chapters)
+                done = 0
+                try:
+                    for result in results:
+                        if result is not None:
+                            combined_body.append((chapters[done][0], result))
+                        done += 1
+                except Exception as e:
+                    # _process_content_file handles its own errors, so this is the pool
+                    # itself failing (e.g. a killed worker); finish in-process below
+                    print(f"    Warning: Parallel processing failed at {chapters[done][1].name} ({e}); processing remaining chapters sequentially")
+
+            # Chapters the pool never returned are processed here, so a pool problem
+            # can't drop content from the book
+            for chapter in chapters[done:]:
+                result = self._process_content_file(chapter, *chapter_args)
+                if result is not None:
+                    combined_body.append((chapter[0], result))
+
+        body_content = self._join_chapters(combined_body)
+        if content_id_mapping is not None:
+            body_content = self.fix_links_and_images(body_content, content_id_mapping)
 
         final_html = self.get_html_template(
             title=metadata.get('title', 'EPUB Content'),
-            body_content='\n<hr class="chapter-separator">\n'.join(combined_body),
+            body_content=body_content,
             metadata=metadata,
-            custom_css=custom_css
+            custom_css=custom_css,
+            metadata_json=metadata_json
         )
         return final_html
 
+    def _join_chapters(self, chapters):
+        """Wrap each (index, body) in its chapter <div> and join them with separators.
+
+        The pieces are joined in one pass, so the combined body is built once rather
+        than once per chapter wrapper and again for the join.
+        """
+        parts = []
+        for i, body in chapters:
+            if parts:
+                parts.append('\n<hr class="chapter-separator">\n')
+            parts.append(f'<div class="chapter" id="page{i:02d}">\n')
+            parts.append(body)
+            parts.append('\n</div>')
+        return ''.join(parts)
+
     def extract_body_content(self, content):
         """Extract and clean body content from HTML/XHTML.
         
         Prioritizes Regex for robustness as selectolax can sometimes return empty/malformed 
-        content for certain XHTML structures (e.g. namespaced tags).
+        content for certain XHTML structures (e.g. namespaced tags). Its HTML5 parser also
+        treats XHTML self-closing tags such as <a id="p1"/> as open tags, nesting the rest
+        of the chapter inside them, so it is only used when the regex finds nothing.
         """
         # Try Regex first as it is most robust for preserving inner HTML content
         result = self._extract_body_content_regex(content)
@@ -616,11 +808,8 @@ class EPUBConverter:
         try:
             tree = HTMLParser(content)
             
-            # Optimization: Fix fake anchors directly in the tree if we're using selectolax
-            # This is much faster than regex or string manipulation later
-            for node in tree.css('a:not([href])'):
-                node.tag = 'span'
-                
+            # Fake anchors (<a> without href) are rewritten by _fix_fake_anchors on every
+            # chapter afterwards; Lexbor nodes don't allow renaming tags in place anyway
             body_element = tree.css_first('body')
             if body_element:
                 # Use .html to preserve inner HTML including attributes
@@ -655,16 +844,25 @@ class EPUBConverter:
             print(f"Warning: selectolax parsing failed, falling back to regex: {e}")
             return self._extract_body_content_regex(content)
 
+    @staticmethod
+    def _slice_element(content, open_pattern, close_pattern):
+        """Return the text between the first opening tag and the first closing tag after it, or None."""
+        open_match = open_pattern.search(content)
+        if not open_match:
+            return None
+        start = open_match.end()
+        close_match = close_pattern.search(content, start)
+        if not close_match:
+            return None
+        return content[start:close_match.start()]
+
     def _extract_body_content_regex(self, content):
         """Extract body content using regex patterns (fallback method)."""
-        body_match = self.body_pattern.search(content)
-        if body_match:
-            body_content = body_match.group(1)
-        else:
-            html_match = self.html_pattern.search(content)
-            if html_match:
-                html_content = self.head_pattern.sub('', html_match.group(1))
-                body_content = html_content
+        body_content = self._slice_element(content, self.body_open_pattern, self.body_close_pattern)
+        if body_content is None:
+            html_content = self._slice_element(content, self.html_open_pattern, self.html_close_pattern)
+            if html_content is not None:
+                body_content = self.head_pattern.sub('', html_content)
             else:
                 body_content = content
         
@@ -675,6 +873,17 @@ class EPUBConverter:
     def _map_toc_to_chapters(self, toc, content_id_mapping):
         """Map TOC entries to correct chapter IDs based on content file mapping.
         Filtered TOC items (like Copyright, Yen Press) are removed from the TOC."""
+        # Lower-cased keys for fuzzy matching, built once per book instead of per
+        # TOC entry. setdefault keeps the first key's position and chapter id, so
+        # iteration order matches a scan over the original mapping.
+        lower_map = {}
+        for key, chapter_id in content_id_mapping.items():
+            lower_map.setdefault(key.lower(), chapter_id)
+        # Fuzzy match results per href path; '' records a known miss
+        match_cache = {}
+        # Log lines for mapped/filtered entries, written in one go at the end
+        toc_log = []
+
         def process_toc_item(item):
             if 'href' in item:
                 original_href = item['href']
@@ -686,33 +895,27 @@ class EPUBConverter:
                     file_path = original_href
                     fragment = None
             
-            # Try to find matching chapter ID
-            chapter_id = None
-            
-            # Try exact match first
-            if file_path in content_id_mapping:
-                chapter_id = content_id_mapping[file_path]
-            else:
-                # Try with just filename
-                filename = Path(file_path).name
-                if filename in content_id_mapping:
-                    chapter_id = content_id_mapping[filename]
-                # Try with URL decoded path
-                elif unquote(file_path) in content_id_mapping:
-                    chapter_id = content_id_mapping[unquote(file_path)]
+            # Try to find matching chapter ID: exact path, then just the filename,
+            # then the URL decoded path
+            chapter_id = (content_id_mapping.get(file_path)
+                          or content_id_mapping.get(_path_name(file_path))
+                          or content_id_mapping.get(_unquote_cached(file_path)))
             
             # If still not found, try fuzzy matching
             if not chapter_id:
-                chapter_id = self._find_closest_chapter_match(file_path, content_id_mapping)
+                chapter_id = match_cache.get(file_path)
+                if chapter_id is None:
+                    chapter_id = self._find_closest_chapter_match(file_path, content_id_mapping, lower_map)
+                    match_cache[file_path] = chapter_id or ''
             
             if chapter_id:
                 # User requested to map strictly to #page{pagenumber} to ensure app navigation works
                 # We ignore fragments (like #link_006) which might be broken or cause issues
                 item['href'] = f"#{chapter_id}"
                 if fragment:
-                    print(f"    Mapped TOC (ignoring fragment #{fragment}): {item['label']} -> {item['href']}")
+                    toc_log.append(f"    Mapped TOC (ignoring fragment #{fragment}): {item['label']} -> {item['href']}")
                 else:
-                    print(f"    Mapped TOC: {item['label']} -> {item['href']}")
+                    toc_log.append(f"    Mapped TOC: {item['label']} -> {item['href']}")
                 
                 # Process children recursively
                 if 'children' in item:
@@ -724,21 +927,35 @@ class EPUBConverter:
             else:
                 # This TOC entry was filtered out (e.g., Copyright, Yen Press)
                 # Return None to indicate it should be removed from TOC
-                print(f"    Filtered TOC entry: {item['label']} ({original_href})")
+                toc_log.append(f"    Filtered TOC entry: {item['label']} ({original_href})")
                 return None
         
         # Process all TOC items and filter out None values (filtered items)
         mapped_toc = [process_toc_item(item) for item in toc]
+        if toc_log:
+            print('\n'.join(toc_log))
         return [item for item in mapped_toc if item is not None]
 
-    def _find_closest_chapter_match(self, file_path, content_id_mapping):
-        """Find the closest matching chapter for a file path."""
+    def _find_closest_chapter_match(self, file_path, content_id_mapping, lower_map=None):
+        """Find the closest matching chapter for a file path.
+
+        lower_map maps lower-cased mapping keys to chapter ids; it is built from
+        content_id_mapping when the caller does not pass one in."""
+        if lower_map is None:
+            lower_map = {}
+            for key, chapter_id in content_id_mapping.items():
+                lower_map.setdefault(key.lower(), chapter_id)
+
         filename = Path(file_path).name.lower()
         stem = Path(file_path).stem.lower()
+
+        # Exact case-insensitive hits before falling back to substring matching
+        chapter_id = lower_map.get(filename) or lower_map.get(stem)
+        if chapter_id:
+            return chapter_id
         
         # Look for partial matches in the mapping keys
-        for key, chapter_id in content_id_mapping.items():
-            key_lower = key.lower()
+        for key_lower, chapter_id in lower_map.items():
             if (filename in key_lower or 
                 stem in key_lower or 
                 key_lower in filename or 
@@ -753,28 +970,20 @@ class EPUBConverter:
             import rcssmin
             return rcssmin.cssmin(css_content)
         except ImportError:
-            # Fallback to simple minification if rcssmin not available
-            # Remove comments
-            css_content = self.css_comment_pattern.sub('', css_content)
-            # Remove whitespace around braces and colons
-            css_content = re.sub(r'\s*([{}:;,])\s*', r'\1', css_content)
-            # Remove remaining whitespace
-            css_content = self.css_whitespace_pattern.sub(' ', css_content)
-            return css_content.strip()
+            # Fallback to a single-pass scanner if rcssmin not available
+            return _minify_scan(css_content, _CSS_TIGHT_CHARS).strip()
 
     def _minify_html(self, html_content):
         """Minify HTML by removing comments, line breaks, and extra whitespace."""
         # Remove HTML comments (but preserve conditional comments for IE)
-        html_content = re.sub(r'<!--(?!\[if\s).*?-->', '', html_content, flags=re.DOTALL)
-        
-        # Remove line breaks and carriage returns
-        html_content = html_content.replace('\n', ' ').replace('\r', '')
+        html_content = self.html_comment_pattern.sub('', html_content)
         
-        # Remove extra whitespace (multiple spaces to single space)
-        html_content = re.sub(r'\s+', ' ', html_content)
+        # Remove carriage returns, then collapse all whitespace (including line breaks) to single spaces
+        html_content = self.whitespace_pattern.sub(' ', html_content.replace('\r', ''))
         
-        # Remove whitespace around tags (but preserve space in text content)
-        html_content = re.sub(r'>\s+<', '><', html_content)
+        # Remove whitespace between tags (but preserve space in text content).
+        # After collapsing, any such run is exactly one space, so a plain replace suffices.
+        html_content = html_content.replace('> <', '><')
         
         return html_content.strip()
 
@@ -785,27 +994,58 @@ class EPUBConverter:
             import rjsmin
             minified = rjsmin.jsmin(js_content)
         except ImportError:
-            # Fallback to simple minification if rjsmin not available
-            # Remove line comments
-            js_content = self.js_line_comment_pattern.sub('', js_content)
-            # Remove block comments
-            js_content = self.js_block_comment_pattern.sub('', js_content)
-            # Remove whitespace around operators and punctuation
-            js_content = re.sub(r'\s*([=+\-*/(){}\[\],;])\s*', r'\1', js_content)
-            # Remove remaining whitespace
-            minified = self.js_whitespace_pattern.sub(' ', js_content)
+            # Fallback to a single-pass scanner if rjsmin not available
+            minified = _minify_scan(js_content, _JS_TIGHT_CHARS, js=True)
 
         # Ensure it is strictly one line regardless of method used
         return minified.replace('\n', ' ').replace('\r', ' ').strip()
 
+    def _write_minified_asset(self, source, dest, minify):
+        """Minify an asset file into dest.
+
+        Returns (original_chars, minified_chars), or None if the source is missing or
+        dest is already at least as new as the source. Minified output is cached
+        in-process on the source path, mtime and size.
+        """
+        if not source.exists():
+            return None
+        source_stat = source.stat()
+        source_mtime = source_stat.st_mtime_ns
+        if dest.exists() and dest.stat().st_mtime_ns >= source_mtime:
+            return None
+
+        # Size guards against same-mtime rewrites on coarse-timestamp filesystems
+        cache_key = (str(source), source_mtime, source_stat.st_size)
+        cached = _minified_asset_cache.get(cache_key)
+        if cached is None:
+            with open(source, 'r', encoding='utf-8') as f:
+                content = f.read()
+            minified = minify(content)
+            # Keep the encoded bytes so repeated writes skip the text layer entirely
+            cached = (len(content), len(minified), minified.encode('utf-8'))
+            _minified_asset_cache[cache_key] = cached
+
+        original_length, minified_length, minified_bytes = cached
+        _write_file_bytes(dest, minified_bytes)
+        return original_length, minified_length
+
     def fix_links_and_images(self, html_content, content_id_mapping):
         """Fix all internal anchor href paths and remove unwanted links."""
+        # Chapter ids that same-page fragments may point at, for O(1) membership checks
+        chapter_ids = set(content_id_mapping.values())
         
         def replace_a_href(match):
             tag_start = match.group(1)
             quote = match.group(2)
             href_val = match.group(3)
 
+            # Fast path: the mapping holds both encoded and decoded file names
+            raw_file_part = href_val.split('#', 1)[0]
+            if raw_file_part:
+                mapped_chapter_id = content_id_mapping.get(raw_file_part)
+                if mapped_chapter_id:
+                    return f'{tag_start}{quote}#{mapped_chapter_id}{quote}'
+
             href = unquote(href_val)
 
             # 1. Remove external links (http, https, mailto, ftp)
@@ -816,7 +1056,7 @@ class EPUBConverter:
                 cleaned_tag = tag_start.rsplit('href=', 1)[0].strip()
                 return cleaned_tag
 
-            if self.data_url_pattern.match(href) or self.static_url_pattern.match(href):
+            if _is_absolute_url(href) or href.startswith('./static'):
                 return match.group(0)
 
             file_part, fragment = (href.split('#', 1) + [''])[:2]
@@ -833,14 +1073,14 @@ class EPUBConverter:
                 # Actually, let's check if the fragment matches any of our mapped chapter IDs.
                 # Our IDs are usually like 'page01', 'chapter01'.
                 # If the fragment is in our values, keep it.
-                if any(fragment == val for val in content_id_mapping.values()):
+                if fragment in chapter_ids:
                      new_href = f'#{fragment}'
                 else:
                      # Unverified local fragment - remove it
                      pass
             elif file_part:
                 # Link to another file
-                mapped_chapter_id = content_id_mapping.get(file_part) or content_id_mapping.get(Path(file_part).name)
+                mapped_chapter_id = content_id_mapping.get(file_part) or content_id_mapping.get(_path_name(file_part))
                 if mapped_chapter_id:
                     new_href = f'#{mapped_chapter_id}'
             
@@ -870,7 +1110,6 @@ class EPUBConverter:
         Ensures identical HTML paths in --no-image and normal modes.
         Also extracts image dimensions for layout stability.
         """
-        # from .image import crc64  # REMOVED: crc64 is no longer used
         path_mapping = {}
         image_metadata = {}
 
@@ -878,20 +1117,53 @@ class EPUBConverter:
         ordered_images = []  # store tuples (relative_to_extract_dir, original_src, filename)
         seen = set()
 
-        for _, content_path in content_files:
+        # src values of the first content file, reused for cover detection below
+        first_content_srcs = []
+
+        def _scan_chapter(content_path):
+            # Scan the raw bytes and decode only the matched src values
+            try:
+                return [
+                    src.decode('utf-8', 'ignore')
+                    for src in self.img_src_extract_bytes_pattern.findall(content_path.read_bytes())
+                ]
+            except Exception:
+                return None
+
+        # Reading and scanning chapters is I/O bound; map keeps reading order so
+        # the dedup below yields the same image order as a sequential scan
+        content_paths = [content_path for _, content_path in content_files]
+        if len(content_paths) <= 3:
+            scanned = map(_scan_chapter, content_paths)
+        else:
+            with ThreadPoolExecutor(max_workers=min(32, len(content_paths))) as executor:
+                scanned = list(executor.map(_scan_chapter, content_paths))
+
+        # (chapter dir, src) -> (resolved path, extract-relative path); chapters in the
+        # same directory reference the same images, so resolve() runs once per pair
+        resolved_srcs = {}
+
+        for index, (content_path, img_matches) in enumerate(zip(content_paths, scanned)):
+            if img_matches is None:
+                continue
             try:
-                with open(content_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                img_matches = self.img_src_extract_pattern.findall(content)
+                if index == 0:
+                    first_content_srcs = img_matches
+                content_dir = content_path.parent
                 for img_src in img_matches:
-                    if img_src.startswith('data:') or self.data_url_pattern.match(img_src):
+                    if _is_absolute_url(img_src):
                         continue
-                    try:
-                        abs_img_path = (content_path.parent / unquote(img_src)).resolve()
-                        rel = abs_img_path.relative_to(extract_dir).as_posix()
-                    except Exception:
-                        # Fallback: just use the src as-is
-                        rel = img_src
+                    cached = resolved_srcs.get((content_dir, img_src))
+                    if cached is not None:
+                        abs_img_path, rel = cached
+                    else:
+                        try:
+                            abs_img_path = (content_dir / unquote(img_src)).resolve()
+                            rel = abs_img_path.relative_to(extract_dir).as_posix()
+                            resolved_srcs[(content_dir, img_src)] = (abs_img_path, rel)
+                        except Exception:
+                            # Fallback: just use the src as-is
+                            rel = img_src
                     if rel not in seen:
                         seen.add(rel)
                         ordered_images.append((rel, img_src, Path(img_src).name, abs_img_path))
@@ -912,11 +1184,8 @@ class EPUBConverter:
         if not cover_rel and content_files:
             try:
                 first_content_path = content_files[0][1]
-                with open(first_content_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    first_content = f.read()
-                first_imgs = self.img_src_extract_pattern.findall(first_content)
-                for img_src in first_imgs:
-                    if img_src.startswith('data:') or self.data_url_pattern.match(img_src):
+                for img_src in first_content_srcs:
+                    if _is_absolute_url(img_src):
                         continue
                     abs_img_path = (first_content_path.parent / unquote(img_src)).resolve()
                     cover_rel = abs_img_path.relative_to(extract_dir).as_posix()
@@ -928,27 +1197,53 @@ class EPUBConverter:
         # IMPORTANT: Normal mode (ImageProcessor) does NOT special-case the cover filename.
         # It uses the same naming scheme for all images.
         # We must match that behavior here.
-        
-        import zlib
-        
+
+        def _inspect_image(abs_path):
+            # Checksum, content digest and dimensions for one image; errors are
+            # returned, not raised, so warnings can still be printed in image order
+            digest = None
+            try:
+                with open(abs_path, 'rb') as f:
+                    data = f.read()
+                checksum = zlib.crc32(data) & 0xffffffff  # Ensure unsigned 32-bit value
+                digest = image_digest(data)
+            except Exception as e:
+                checksum = e
+            try:
+                dimensions = self.image_processor.get_image_dimensions(abs_path)
+            except Exception as e:
+                dimensions = e
+            return checksum, digest, dimensions
+
+        # Reading and checksumming images is I/O bound and zlib releases the GIL on
+        # large buffers; map keeps image order so the numbering is unchanged
+        image_paths = [abs_path for _, _, _, abs_path in ordered_images]
+        if len(image_paths) <= 3:
+            inspected = map(_inspect_image, image_paths)
+        else:
+            with ThreadPoolExecutor(max_workers=min(32, len(image_paths))) as executor:
+                inspected = list(executor.map(_inspect_image, image_paths))
+
         image_index = 1
+        # Output name of the first image with each content digest; normal mode encodes
+        # identical files once, so copies map to the first one's file here as well
+        output_by_digest = {}
 
-        for rel, original_src, filename, abs_path in ordered_images:
+        for (rel, original_src, filename, abs_path), (crc32_value, digest, dimensions) in zip(ordered_images, inspected):
             # Determine if this is the cover image
             is_cover = False
             if cover_rel and rel == cover_rel:
                 is_cover = True
 
-            # Calculate CRC32 checksum of the image file to match ImageProcessor naming
-            try:
-                with open(abs_path, 'rb') as f:
-                    file_content = f.read()
-                    crc32_value = zlib.crc32(file_content) & 0xffffffff  # Ensure unsigned 32-bit value
-                
+            # Use the CRC32 checksum of the image file to match ImageProcessor naming
+            if digest in output_by_digest:
+                output_filename = output_by_digest[digest]
+            elif isinstance(crc32_value, int):
                 # Generate CRC32-based filename: {crc32}-{index:02d}.avif
                 output_filename = f"{crc32_value:08x}-{image_index:02d}.avif"
-            except Exception as e:
-                print(f"    Warning: Could not calculate CRC32 for {filename}: {e}")
+                output_by_digest[digest] = output_filename
+            else:
+                print(f"    Warning: Could not calculate CRC32 for {filename}: {crc32_value}")
                 # Fallback to index-only naming if CRC32 calculation fails
                 output_filename = f"image-{image_index:02d}.avif"
             html_path = f"/images/{output_filename}"
@@ -967,7 +1262,9 @@ class EPUBConverter:
             
             # Extract dimensions
             try:
-                width, height = self.image_processor.get_image_dimensions(abs_path)
+                if isinstance(dimensions, Exception):
+                    raise dimensions
+                width, height = dimensions
                 if width and height:
                     image_metadata[html_path] = {
                         'width': width,
@@ -1040,12 +1337,11 @@ class EPUBConverter:
                 if not actual_cover_file_path and content_files:
                     first_content_file_path = content_files[0][1]
                     try:
-                        with open(first_content_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            first_page_content = f.read()
-                        
-                        # Find all images in the first content file
-                        img_matches = re.findall(r'<img[^>]+src=["\']([^"\\]+)["\\]', first_page_content, re.IGNORECASE)
-                        for img_src in img_matches:
+                        # Scan raw bytes so we can stop at the first usable <img> without decoding the whole chapter
+                        first_page_data = first_content_file_path.read_bytes()
+
+                        for img_match in self.img_src_bytes_pattern.finditer(first_page_data):
+                            img_src = img_match.group(1).decode('utf-8', 'ignore')
                             if img_src.startswith('data:'):
                                 continue
                             first_content_file_dir = first_content_file_path.parent
@@ -1062,9 +1358,8 @@ class EPUBConverter:
 
                 # Method 3: If still no cover found, use the first image from all images
                 if not actual_cover_file_path and all_image_files:
-                    # Sort images by path to ensure consistent ordering
-                    sorted_images = sorted(all_image_files)
-                    actual_cover_file_path = sorted_images[0]
+                    # Pick the smallest path for consistent ordering (min() avoids sorting the whole list)
+                    actual_cover_file_path = min(all_image_files)
                     print(f"  Using first available image as cover: {actual_cover_file_path.name}")
 
                 # Process images with EPUB title and cover image path
@@ -1129,13 +1424,19 @@ class EPUBConverter:
             content_id_mapping = {}
             for i, (_, content_file) in enumerate(content_files, 1):
                 chapter_id = f"page{i:02d}"
+                name = content_file.name
                 relative_path = unquote(content_file.relative_to(extract_dir).as_posix())
-                content_id_mapping[relative_path] = chapter_id
-                content_id_mapping[content_file.name] = chapter_id
-                # Also map common path variations
-                content_id_mapping[content_file.stem] = chapter_id
-                content_id_mapping[f"Text/{content_file.name}"] = chapter_id
-                content_id_mapping[f"OEBPS/{content_file.name}"] = chapter_id
+                content_id_mapping.update({
+                    relative_path: chapter_id,
+                    name: chapter_id,
+                    # URL-encoded forms too so raw hrefs resolve without unquote() per link
+                    quote(relative_path): chapter_id,
+                    quote(name): chapter_id,
+                    # Also map common path variations
+                    _path_stem(name): chapter_id,
+                    "Text/" + name: chapter_id,
+                    "OEBPS/" + name: chapter_id,
+                })
             
             # Process TOC entries to map them to correct chapter IDs
             if toc:
@@ -1152,24 +1453,25 @@ class EPUBConverter:
                 except Exception as e:
                     print(f"  Warning: Could not read custom CSS file: {e}")
 
-            combined_html = self.combine_and_generate_html(content_files, extract_dir, metadata, path_mapping, custom_css, image_metadata=locals().get('image_metadata'))
-            final_html = self.fix_links_and_images(combined_html, content_id_mapping)
+            # Serialize the frontend metadata once, now that the TOC is final
+            metadata_json = self._sanitize_metadata(metadata)
+
+            final_html = self.combine_and_generate_html(content_files, extract_dir, metadata, path_mapping, custom_css, image_metadata=locals().get('image_metadata'), metadata_json=metadata_json, content_id_mapping=content_id_mapping)
             
             # Minify HTML: remove comments, line breaks, and extra whitespace
             final_html = self._minify_html(final_html)
             
+            # Encode once and hand the bytes straight to the OS (no TextIOWrapper chunking)
             output_html = epub_output_folder / "index.html"
-            with open(output_html, 'w', encoding='utf-8') as f:
-                f.write(final_html)
+            _write_file_bytes(output_html, final_html.encode('utf-8'))
 
             # Handle static files based on --no-script flag and mode
             # Only create static folder if not in directory mode (where it's created at root)
-            if hasattr(self, 'central_static_folder') and self.central_static_folder:
+            if self.central_static_folder:
                 # Directory mode: static files are at root, no need to copy
                 print(f"  Using root-level static files at {self.central_static_folder}/")
             elif not self.no_script:
                 # Single file mode: create local static folder
-                assets_folder = Path(__file__).parent / "assets"
                 output_static_folder = epub_output_folder / "static"
                 
                 # Remove existing static folder if it exists (clean up from previous runs)
@@ -1179,26 +1481,14 @@ class EPUBConverter:
                 output_static_folder.mkdir(exist_ok=True)
                 
                 # Copy and minify CSS file
-                css_source = assets_folder / "style.css"
-                css_dest = output_static_folder / "style.css"
-                if css_source.exists():
-                    with open(css_source, 'r', encoding='utf-8') as f:
-                        css_content = f.read()
-                    minified_css = self._minify_css(css_content)
-                    with open(css_dest, 'w', encoding='utf-8') as f:
-                        f.write(minified_css)
-                    print(f"  Minified CSS: {len(css_content)} -> {len(minified_css)} characters")
+                css_result = self._write_minified_asset(_CSS_SRC, output_static_folder / "style.css", self._minify_css)
+                if css_result:
+                    print(f"  Minified CSS: {css_result[0]} -> {css_result[1]} characters")
                 
                 # Copy and minify JS file
-                js_source = assets_folder / "script.js"
-                js_dest = output_static_folder / "script.js"
-                if js_source.exists():
-                    with open(js_source, 'r', encoding='utf-8') as f:
-                        js_content = f.read()
-                    minified_js = self._minify_js(js_content)
-                    with open(js_dest, 'w', encoding='utf-8') as f:
-                        f.write(minified_js)
-                    print(f"  Minified JS: {len(js_content)} -> {len(minified_js)} characters")
+                js_result = self._write_minified_asset(_JS_SRC, output_static_folder / "script.js", self._minify_js)
+                if js_result:
+                    print(f"  Minified JS: {js_result[0]} -> {js_result[1]} characters")
             else:
                 print(f"  Skipping static files (--no-script mode)")
 
@@ -1207,7 +1497,7 @@ class EPUBConverter:
     def convert(self, max_workers=100):
         """Convert a single EPUB file or all EPUB files in a directory."""
         self._start_profiling()
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
             if self.epub_path.is_file():
@@ -1228,41 +1518,37 @@ class EPUBConverter:
                         count = sum(1 for epub in epub_files if epub.parent == epub_dir)
                         print(f"    {epub_dir}: {count} EPUB(s)")
                 
+                # A lone EPUB is converted like a single-file path, with images/ and static/
+                # next to its output, unless central folders were explicitly requested
+                use_central_folders = len(epub_files) > 1 or self.centralize
+                
                 # Create central images folder for directory conversions
-                if not self.no_image:
+                if use_central_folders and not self.no_image:
                     self.central_images_folder = self.epub_path / "images"
                     self.central_images_folder.mkdir(exist_ok=True)
                     print(f"  Using central images folder: {self.central_images_folder}/")
                 
                 # Create central static folder for directory conversions
-                if not self.no_script:
+                if use_central_folders and not self.no_script:
                     self.central_static_folder = self.epub_path / "static"
                     self.central_static_folder.mkdir(exist_ok=True)
                     
                     # Copy static files only once at the root level
-                    assets_folder = Path(__file__).parent / "assets"
-                    
-                    # Copy and minify CSS file (always overwrite to ensure freshness)
-                    css_source = assets_folder / "style.css"
+                    # Copy and minify CSS file (skipped when the existing copy is newer than the source)
                     css_dest = self.central_static_folder / "style.css"
-                    if css_source.exists():
-                        with open(css_source, 'r', encoding='utf-8') as f:
-                            css_content = f.read()
-                        minified_css = self._minify_css(css_content)
-                        with open(css_dest, 'w', encoding='utf-8') as f:
-                            f.write(minified_css)
-                        print(f"  Wrote root static CSS: {css_dest} ({len(css_content)} -> {len(minified_css)} chars)")
+                    css_result = self._write_minified_asset(_CSS_SRC, css_dest, self._minify_css)
+                    if css_result:
+                        print(f"  Wrote root static CSS: {css_dest} ({css_result[0]} -> {css_result[1]} chars)")
+                    elif css_dest.exists():
+                        print(f"  Root static CSS up to date: {css_dest}")
                     
-                    # Copy and minify JS file (always overwrite to ensure freshness)
-                    js_source = assets_folder / "script.js"
+                    # Copy and minify JS file (skipped when the existing copy is newer than the source)
                     js_dest = self.central_static_folder / "script.js"
-                    if js_source.exists():
-                        with open(js_source, 'r', encoding='utf-8') as f:
-                            js_content = f.read()
-                        minified_js = self._minify_js(js_content)
-                        with open(js_dest, 'w', encoding='utf-8') as f:
-                            f.write(minified_js)
-                        print(f"  Wrote root static JS: {js_dest} ({len(js_content)} -> {len(minified_js)} chars)")
+                    js_result = self._write_minified_asset(_JS_SRC, js_dest, self._minify_js)
+                    if js_result:
+                        print(f"  Wrote root static JS: {js_dest} ({js_result[0]} -> {js_result[1]} chars)")
+                    elif js_dest.exists():
+                        print(f"  Root static JS up to date: {js_dest}")
                     print(f"  Using central static folder: {self.central_static_folder}/")
                 
                 # Use parallel processing for multiple EPUB files
@@ -1274,10 +1560,10 @@ class EPUBConverter:
                         self.convert_single_epub(epub_files[0])
                     except Exception as e:
                         print(f"FATAL: Error converting {epub_files[0].name}: {e}")
-                        import traceback
-                        traceback.print_exc()
+                        if self.debug:
+                            traceback.print_exc()
                 
-                total_time = time.time() - start_time
+                total_time = time.monotonic() - start_time
                 print(f"\nConversion complete! Total time: {self._format_time(total_time)}")
                 
                 # Performance summary for large batches
@@ -1297,47 +1583,166 @@ class EPUBConverter:
 
     def _convert_parallel(self, epub_files, max_workers):
         """Convert multiple EPUB files in parallel using optimal executor for threading mode."""
-        executor_class = ThreadPoolExecutor if self.free_threading else ProcessPoolExecutor
-        
-        if self.free_threading:
-            # With free-threading, we can use more threads efficiently
-            optimal_workers = min(max_workers, len(epub_files), os.cpu_count() * 8)
-            print(f"Using ThreadPoolExecutor with {optimal_workers} workers (free-threading enabled)")
+        use_threads = self._use_threads()
+        if use_threads:
+            # Conversion is mostly zip/XML/file I/O; beyond ~2x CPU count extra threads
+            # only add lock contention. EPUB_MAX_WORKERS overrides the cap.
+            thread_cap = self._env_worker_cap() or (os.cpu_count() or 1) * 2
+            optimal_workers = min(max_workers, len(epub_files), thread_cap)
+            reason = "free-threading enabled" if self.free_threading else "--executor threads"
+            print(f"Using ThreadPoolExecutor with {optimal_workers} workers ({reason})")
         else:
             # With GIL, limit to CPU count to avoid overhead
             optimal_workers = min(max_workers, len(epub_files), os.cpu_count())
-            print(f"Using ProcessPoolExecutor with {optimal_workers} workers (GIL-limited)")
+            reason = "--executor processes" if self.free_threading else "GIL-limited"
+            print(f"Using ProcessPoolExecutor with {optimal_workers} workers ({reason})")
         
         completed_count = 0
         failed_count = 0
         total_files = len(epub_files)
-        start_time = time.time()
+        start_time = time.monotonic()
         
-        with executor_class(max_workers=optimal_workers) as executor:
-            # Submit all conversion tasks
-            future_to_epub = {
-                executor.submit(self._convert_single_with_error_handling, epub_file): epub_file 
-                for epub_file in epub_files
-            }
-            
-            # Process completed tasks as they finish
-            for future in as_completed(future_to_epub):
-                epub_file = future_to_epub[future]
+        # Progress lines are buffered and written in batches (every 25 lines or
+        # 2 seconds) instead of one print() per finished file
+        pending_lines = []
+        last_flush = time.monotonic()
+        
+        # Redirected output (typical for large batches) gets compact key=value lines:
+        # failures plus one progress line per 100 files, written straight to the fd
+        interactive = sys.stdout.isatty()
+        stdout_fd = None
+        if not interactive:
+            try:
+                stdout_fd = sys.stdout.fileno()
+            except (AttributeError, ValueError):
+                pass
+
+        def report(line):
+            nonlocal last_flush
+            pending_lines.append(line + "\n")
+            now = time.monotonic()
+            if len(pending_lines) >= 25 or now - last_flush >= 2:
+                flush_progress()
+                last_flush = now
+
+        def flush_progress():
+            if pending_lines:
+                if stdout_fd is not None:
+                    # Flush earlier print() output first so lines stay in order
+                    sys.stdout.flush()
+                    _write_fd(stdout_fd, "".join(pending_lines).encode('utf-8'))
+                else:
+                    sys.stdout.write("".join(pending_lines))
+                    sys.stdout.flush()
+                pending_lines.clear()
+
+        def report_failed(epub_file, error=None):
+            if interactive:
+                detail = f" - {error}" if error is not None else ""
+                report(f"Failed ({failed_count} failures): {epub_file.name}{detail}")
+            else:
+                detail = f" error={str(error)!r}" if error is not None else ""
+                report(f"status=failed failures={failed_count} file={epub_file.name!r}{detail}")
+
+        def report_progress(epub_file=None):
+            # epub_file is given when each completion is reported individually
+            done_count = completed_count + failed_count
+            if interactive:
+                if epub_file is None and done_count % 50 and done_count != total_files:
+                    return
+                elapsed = time.monotonic() - start_time
+                remaining_time = self._estimate_remaining_time(done_count, total_files, start_time)
+                if epub_file is not None:
+                    report(f"Completed ({completed_count}/{total_files}): {epub_file.name} | Elapsed: {self._format_time(elapsed)} | ETA: {remaining_time}")
+                else:
+                    report(f"Progress ({done_count}/{total_files}) | Elapsed: {self._format_time(elapsed)} | ETA: {remaining_time}")
+            elif done_count % 100 == 0 or done_count == total_files:
+                elapsed = time.monotonic() - start_time
+                remaining_time = self._estimate_remaining_time(done_count, total_files, start_time)
+                report(f"status=progress done={done_count} total={total_files} failed={failed_count} elapsed={elapsed:.1f} eta={remaining_time}")
+
+        if use_threads:
+            # Threads share this converter directly
+            executor = ThreadPoolExecutor(max_workers=optimal_workers)
+            convert_fn = self._convert_single_with_error_handling
+        else:
+            # Give each worker process its converter up front so only the EPUB path
+            # is pickled per task, not the whole converter
+            mp_context = _get_fork_context()
+            if mp_context is not None:
+                # Forked workers inherit this converter copy-on-write, so compile the
+                # template here once instead of once per worker
+                self._get_reader_template()
+                initializer, initargs = _adopt_converter, (self,)
+            else:
+                # spawn: rebuild the converter from its settings in each worker
+                initializer, initargs = _init_worker, (self._worker_config(),)
+            executor = ProcessPoolExecutor(
+                max_workers=optimal_workers,
+                mp_context=mp_context,
+                initializer=initializer,
+                initargs=initargs
+            )
+            convert_fn = _convert_in_worker
+
+        with executor:
+            if not use_threads and total_files > 100:
+                # Large GIL-bound batches: hand workers chunks of files to amortize
+                # pickling/IPC per task, and report progress every 50 files
+                chunksize = max(1, total_files // (optimal_workers * 4))
+                results = executor.map(convert_fn, epub_files, chunksize=chunksize)
                 try:
-                    result = future.result()
-                    if result:
-                        completed_count += 1
-                        elapsed = time.time() - start_time
-                        remaining_time = self._estimate_remaining_time(completed_count, total_files, start_time)
-                        print(f"Completed ({completed_count}/{total_files}): {epub_file.name} | Elapsed: {self._format_time(elapsed)} | ETA: {remaining_time}")
-                    else:
-                        failed_count += 1
-                        print(f"Failed ({failed_count} failures): {epub_file.name}")
+                    for epub_file, result in zip(epub_files, results):
+                        if result:
+                            completed_count += 1
+                        else:
+                            failed_count += 1
+                            report_failed(epub_file)
+                        report_progress()
                 except Exception as e:
-                    failed_count += 1
-                    print(f"Failed ({failed_count} failures): {epub_file.name} - {e}")
+                    # The pool itself broke (e.g. a worker was killed); the rest never ran
+                    failed_count = total_files - completed_count
+                    report(f"Parallel conversion aborted: {e}")
+            else:
+                # Keep at most 2x workers tasks in flight: enough to keep the pool
+                # saturated without tracking a future per file for huge batches
+                window = 2 * optimal_workers
+                future_to_epub = {}
+                epub_iter = iter(epub_files)
+                
+                while True:
+                    for epub_file in epub_iter:
+                        try:
+                            future_to_epub[executor.submit(convert_fn, epub_file)] = epub_file
+                        except Exception as e:
+                            # The pool broke while earlier tasks ran; nothing more can be submitted
+                            failed_count += 1
+                            report_failed(epub_file, e)
+                            continue
+                        if len(future_to_epub) >= window:
+                            break
+                    if not future_to_epub:
+                        break
+                    
+                    # Process whichever tasks finished, then top the window back up
+                    done, _ = wait(future_to_epub, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        epub_file = future_to_epub.pop(future)
+                        try:
+                            result = future.result()
+                            if result:
+                                completed_count += 1
+                                report_progress(epub_file)
+                            else:
+                                failed_count += 1
+                                report_failed(epub_file)
+                        except Exception as e:
+                            failed_count += 1
+                            report_failed(epub_file, e)
+
+        flush_progress()
         
-        total_time = time.time() - start_time
+        total_time = time.monotonic() - start_time
         print(f"\nParallel conversion finished:")
         print(f"  Successfully converted: {completed_count}")
         print(f"  Failed conversions: {failed_count}")
@@ -1348,45 +1753,72 @@ class EPUBConverter:
         if self.free_threading:
             print(f"  Free-threading performance: {completed_count / total_time:.1f} EPUBs/second")
 
+    def _env_worker_cap(self):
+        """Return the EPUB_MAX_WORKERS override as a positive int, or None if unset/invalid."""
+        value = os.environ.get('EPUB_MAX_WORKERS', '').strip()
+        if not value:
+            return None
+        try:
+            cap = int(value)
+        except ValueError:
+            print(f"Warning: Ignoring invalid EPUB_MAX_WORKERS={value!r}")
+            return None
+        return cap if cap > 0 else None
+
+    def _worker_config(self):
+        """Settings needed to rebuild this converter inside a worker process."""
+        return {
+            'init': {
+                'epub_path': self.epub_path,
+                'output_folder': self.output_folder,
+                'custom_css_path': self.custom_css_path,
+                'no_script': self.no_script,
+                'no_image': self.no_image,
+                'debug': self.debug,
+                'centralize': self.centralize,
+                'executor': self.executor,
+            },
+            'central_images_folder': self.central_images_folder,
+            'central_static_folder': self.central_static_folder,
+        }
+
     def _convert_single_with_error_handling(self, epub_file):
         """Convert a single EPUB file with proper error handling for parallel execution."""
         try:
             self.convert_single_epub(epub_file)
             return True
         except Exception as e:
-            print(f"Error converting {epub_file.name}: {e}")
-            import traceback
-            traceback.print_exc()
+            # stderr keeps errors out of the batched progress lines on stdout
+            sys.stderr.write(f"Error converting {epub_file.name}: {type(e).__name__}: {e}\n")
+            if self.debug:
+                traceback.print_exc()
             return False
 
-    def get_html_template(self, title, body_content, metadata, custom_css=None):
-        """Returns the complete HTML structure with embedded CSS and JS."""
-        template = self.jinja_env.get_template("reader.html")
-        
-        # Sanitize metadata to remove sensitive information
-        # Only include fields that are actually used by the frontend JavaScript
-        sanitized_metadata = {
-            'title': metadata.get('title'),
-            'author': metadata.get('author'),
-            'publisher': metadata.get('publisher'),
-            'date': metadata.get('date'),
-            'description': metadata.get('description'),
-            'subject': metadata.get('subject', []),
-            'language': metadata.get('language'),
-            'cover_image_url': metadata.get('cover_image_url'),
-            'epub_filename': metadata.get('epub_filename'),
-            'epub_filename_base': metadata.get('epub_filename_base'),
-            'epub_filename_base_url': metadata.get('epub_filename_base_url'),
-            'epub_filename_cdn_base_url': metadata.get('epub_filename_cdn_base_url'),
-            'toc': metadata.get('toc', []),
-            # Note: content_id_mapping is removed as it's not needed by frontend
-            # and contains EPUB internal structure (OEBPS paths, etc.)
-        }
-        
+    def _sanitize_metadata(self, metadata):
+        """Serialize only the metadata fields used by the frontend JavaScript to JSON."""
+        sanitized_metadata = FrontendMetadata.from_metadata(metadata)
+
         if HAS_ORJSON:
-            metadata_json = json.dumps(sanitized_metadata).decode('utf-8')
-        else:
-            metadata_json = json.dumps(sanitized_metadata)
+            # orjson serializes (slotted) dataclasses natively
+            return orjson.dumps(sanitized_metadata).decode('utf-8')
+        # Match orjson's compact, non-ASCII-escaped output
+        return json.dumps(asdict(sanitized_metadata), ensure_ascii=False, separators=(',', ':'))
+
+    def _get_reader_template(self):
+        """Return the compiled reader.html template, loading it on first use."""
+        if self._reader_template is None:
+            self._reader_template = self.jinja_env.get_template("reader.html")
+        return self._reader_template
+
+    def get_html_template(self, title, body_content, metadata, custom_css=None, metadata_json=None):
+        """Returns the complete HTML structure with embedded CSS and JS.
+
+        metadata_json may be passed in pre-serialized; otherwise it is built from metadata.
+        """
+        template = self._get_reader_template()
+        
+        if metadata_json is None:
+            metadata_json = self._sanitize_metadata(metadata)
         return template.render(
             title=title,
             body_content=body_content,
@@ -1395,3 +1827,39 @@ class EPUBConverter:
             custom_css=custom_css,
             no_script=self.no_script
         )
+
+
+# Converter owned by the current ProcessPoolExecutor worker (set by _init_worker)
+_worker_converter = None
+# Shared per-book chapter arguments for forked chapter workers (set by _adopt_converter)
+_worker_chapter_args = None
+
+def _get_fork_context():
+    """Return the 'fork' multiprocessing context on Linux, None elsewhere (default start method)."""
+    if sys.platform.startswith('linux'):
+        return multiprocessing.get_context('fork')
+    return None
+
+def _adopt_converter(converter, chapter_args=None):
+    """ProcessPoolExecutor initializer for forked workers: reuse the inherited converter.
+
+    chapter_args holds the per-book arguments shared by every chapter task.
+    """
+    global _worker_converter, _worker_chapter_args
+    _worker_converter = converter
+    _worker_chapter_args = chapter_args
+
+def _init_worker(config):
+    """ProcessPoolExecutor initializer: build the worker's converter once."""
+    global _worker_converter
+    _worker_converter = EPUBConverter(**config['init'])
+    _worker_converter.central_images_folder = config['central_images_folder']
+    _worker_converter.central_static_folder = config['central_static_folder']
+
+def _convert_in_worker(epub_file):
+    """ProcessPoolExecutor task: convert one EPUB with the worker's converter."""
+    return _worker_converter._convert_single_with_error_handling(epub_file)
+
+def _process_content_in_worker(chapter):
+    """ProcessPoolExecutor task: process one (index, path) chapter with the worker's converter."""
+    return _worker_converter._process_content_file(chapter, *_worker_chapter_args)
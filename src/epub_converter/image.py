@@ -1,11 +1,20 @@
 import os
+import re
 import hashlib
+import zlib
 from pathlib import Path
 from urllib.parse import unquote
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import multiprocessing
 
-# CRC64 removed for performance - using sequential naming instead
+# Output files are named {crc32 of the source bytes}-{index:02d}.avif (zlib.crc32, in C)
+
+def image_digest(data):
+    """Content digest used to spot the same image stored under several paths."""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+# <img ... src="..."> or src='...' in content files
+_IMG_SRC_PATTERN = re.compile(rb'<img[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
 
 # Try to add libvips bin directory to Python's DLL search path
 # This ensures pyvips can find libvips-42.dll even if PATH is not set correctly
@@ -40,6 +49,13 @@ def _add_libvips_to_dll_path():
 # Try to add libvips to DLL path on module load
 _libvips_path = _add_libvips_to_dll_path()
 
+# Imported once here (after the DLL path is set up) rather than inside every
+# per-image call; _check_pyvips reports a missing module when a processor is built
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
+
 # Initialize flags
 HAS_PYVIPS = False
 
@@ -47,19 +63,92 @@ HAS_PYVIPS = False
 def _check_pyvips():
     """Check if pyvips is available and working."""
     global HAS_PYVIPS
-    try:
-        import pyvips
-        # Test if pyvips can actually load the libvips library
-        try:
-            # Try to create a simple image to verify libvips is working
-            test_img = pyvips.Image.black(1, 1)
-            HAS_PYVIPS = True
-            print("pyvips loaded - ultra-fast image processing enabled")
-            return True
-        except Exception as e:
-            raise ImportError(f"pyvips installed but libvips library not available: {e}")
-    except ImportError:
+    if pyvips is None:
         raise ImportError("pyvips is not installed. Please install it with: pip install pyvips")
+    # Test if pyvips can actually load the libvips library
+    try:
+        # Try to create a simple image to verify libvips is working
+        test_img = pyvips.Image.black(1, 1)
+        HAS_PYVIPS = True
+        print("pyvips loaded - ultra-fast image processing enabled")
+        return True
+    except Exception as e:
+        raise ImportError(f"pyvips installed but libvips library not available: {e}")
+
+def _env_int(name, default):
+    """Return environment variable name as a non-negative int, or default if unset/invalid."""
+    value = os.environ.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        print(f"Warning: Ignoring invalid {name}={value!r}")
+        return default
+    return number if number >= 0 else default
+
+# JPEG start-of-frame markers (SOF0-SOF15 minus DHT, JPG and DAC) carry the frame size
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def _read_image_dimensions_fast(img_path):
+    """Read width/height from the file header without decoding the image.
+
+    Handles PNG, GIF, BMP, WebP and JPEG. Returns (None, None) for anything
+    else (AVIF, SVG, ...) so the caller can fall back to a full loader.
+    """
+    with open(img_path, 'rb') as f:
+        head = f.read(32)
+
+        if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+            return int.from_bytes(head[16:20], 'big'), int.from_bytes(head[20:24], 'big')
+
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return int.from_bytes(head[6:8], 'little'), int.from_bytes(head[8:10], 'little')
+
+        if head[:2] == b'BM' and len(head) >= 26:
+            width = int.from_bytes(head[18:22], 'little', signed=True)
+            height = int.from_bytes(head[22:26], 'little', signed=True)
+            return abs(width), abs(height)
+
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            chunk = head[12:16]
+            if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+                return (int.from_bytes(head[26:28], 'little') & 0x3FFF,
+                        int.from_bytes(head[28:30], 'little') & 0x3FFF)
+            if chunk == b'VP8L' and head[20:21] == b'\x2f':
+                bits = int.from_bytes(head[21:25], 'little')
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b'VP8X':
+                return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+            return None, None
+
+        if head[:3] == b'\xff\xd8\xff':
+            # Walk the marker segments until the first SOF, seeking past everything else
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None, None
+                # Skip fill bytes
+                while marker[1] == 0xFF:
+                    marker = marker[1:] + f.read(1)
+                    if len(marker) < 2:
+                        return None, None
+                code = marker[1]
+                if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+                    continue
+                length_bytes = f.read(2)
+                if len(length_bytes) < 2:
+                    return None, None
+                length = int.from_bytes(length_bytes, 'big')
+                if code in _JPEG_SOF_MARKERS:
+                    frame = f.read(5)
+                    if len(frame) < 5:
+                        return None, None
+                    return int.from_bytes(frame[3:5], 'big'), int.from_bytes(frame[1:3], 'big')
+                f.seek(length - 2, os.SEEK_CUR)
+
+    return None, None
 
 class ImageProcessor:
     def __init__(self):
@@ -67,22 +156,45 @@ class ImageProcessor:
         _check_pyvips()  # Will raise ImportError if pyvips is not available
         
         # Determine optimal number of workers for parallel processing
-        self.max_workers = min(multiprocessing.cpu_count(), 10)  # Cap at 8 to avoid memory issues
+        self.max_workers = min(multiprocessing.cpu_count(), 8)  # Cap at 8 to avoid memory issues
         
         if HAS_PYVIPS:
-            import pyvips
-            # Configure pyvips for optimal performance
-            pyvips.cache_set_max(100)  # Cache up to 100 images
-            pyvips.cache_set_max_mem(500 * 1024 * 1024)  # 500MB cache
+            # Each image runs through its pipeline once, so cached operations are never
+            # reused and only hold decoded pixels alive; the cache is off by default
+            pyvips.cache_set_max(_env_int('PYVIPS_CACHE_MAX', 0))
+            pyvips.cache_set_max_mem(_env_int('PYVIPS_CACHE_MAX_MEM', 500 * 1024 * 1024))
     
     def find_images(self, extract_dir):
         """Find all image files in the EPUB"""
         image_files = []
         image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.avif', '.bmp'}
-        for root, _, files in os.walk(extract_dir):
-            for file in files:
-                if Path(file).suffix.lower() in image_extensions:
-                    image_files.append(Path(root) / file)
+
+        def walk(directory):
+            # Same order as os.walk: a directory's files first, then its subdirectories
+            # (symlinked ones are not followed); suffixes are checked on the entry name
+            # string instead of building a Path for every file
+            subdirs = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if is_dir:
+                            if not entry.is_symlink():
+                                subdirs.append(entry.path)
+                            continue
+                        dot = name.rfind('.')
+                        if 0 < dot < len(name) - 1 and name[dot:].lower() in image_extensions:
+                            image_files.append(Path(entry.path))
+            except OSError:
+                return
+            for subdir in subdirs:
+                walk(subdir)
+
+        walk(extract_dir)
         return image_files
     
     def filter_images_by_content(self, image_files, content_files):
@@ -95,21 +207,21 @@ class ImageProcessor:
         image_lookup = {}
         for img_path in image_files:
             image_lookup[img_path.name] = img_path
-            # Also map absolute path string for direct lookups
-            image_lookup[str(img_path.resolve())] = img_path
+            # Also map the normalized absolute path for direct lookups; normalizing
+            # lexically keeps the per-reference lookups free of filesystem calls
+            image_lookup[os.path.abspath(img_path)] = img_path
         
         ordered_images = []
         seen_images = set()
         
         for _, content_path in content_files:
             try:
-                with open(content_path, 'r', encoding='utf-8', errors='ignore') as f:
+                base_dir = os.path.abspath(content_path.parent)
+                with open(content_path, 'rb') as f:
                     content = f.read()
-                    # Find all image references in the content
-                    import re
-                    # Match img src="..." or src='...' patterns
-                    for match in re.finditer(r'<img[^>]+src=["\']([^"\\]+)["\\]', content, re.IGNORECASE):
-                        src = match.group(1)
+                    # Find all image references in the content; only the matched src is decoded
+                    for match in _IMG_SRC_PATTERN.finditer(content):
+                        src = match.group(1).decode('utf-8', 'ignore')
                         if src.startswith('data:'):
                             continue
                             
@@ -118,9 +230,8 @@ class ImageProcessor:
                         
                         # Method 1: Try to resolve relative path
                         try:
-                            abs_path = (content_path.parent / unquote(src)).resolve()
-                            if str(abs_path) in image_lookup:
-                                found_image = image_lookup[str(abs_path)]
+                            abs_path = os.path.normpath(os.path.join(base_dir, unquote(src)))
+                            found_image = image_lookup.get(abs_path)
                         except Exception:
                             pass
                             
@@ -139,12 +250,15 @@ class ImageProcessor:
         
         return ordered_images
 
-    def _analyze_image_with_pyvips(self, img_path):
-        """Analyze image using pyvips for complexity and B&W detection."""
+    def _analyze_image_with_pyvips(self, img_path, img=None):
+        """Analyze image using pyvips for complexity and B&W detection.
+
+        Pass the already loaded image as img to avoid opening the file again.
+        """
         try:
-            import pyvips
             # Load image with pyvips
-            img = pyvips.Image.new_from_file(str(img_path))
+            if img is None:
+                img = pyvips.Image.new_from_file(str(img_path))
             
             # Get basic info
             width, height = img.width, img.height
@@ -168,9 +282,12 @@ class ImageProcessor:
                 
                 # Calculate standard deviation for complexity
                 try:
-                    r_std = rgb_img[0].deviate()
-                    g_std = rgb_img[1].deviate()
-                    b_std = rgb_img[2].deviate()
+                    # stats() gathers every band's statistics in one pixel scan; row
+                    # n is band n-1 and column 5 holds its standard deviation
+                    band_stats = rgb_img.stats()
+                    r_std = band_stats(5, 1)[0]
+                    g_std = band_stats(5, 2)[0]
+                    b_std = band_stats(5, 3)[0]
                     # Check for NaN or invalid values
                     if not (isinstance(r_std, (int, float)) and isinstance(g_std, (int, float)) and isinstance(b_std, (int, float))):
                         raise ValueError("Invalid standard deviation values")
@@ -190,15 +307,15 @@ class ImageProcessor:
                 
                 # Check if B&W by comparing channels
                 try:
-                    rg_diff = rgb_img[0].subtract(rgb_img[1]).abs().avg()
-                    rb_diff = rgb_img[0].subtract(rgb_img[2]).abs().avg()
-                    gb_diff = rgb_img[1].subtract(rgb_img[2]).abs().avg()
+                    # Sum the three channel differences in one expression so libvips
+                    # evaluates a single pipeline and reduction instead of three
+                    r, g, b = rgb_img[0], rgb_img[1], rgb_img[2]
+                    diff_sum = ((r - g).abs() + (r - b).abs() + (g - b).abs()).avg()
                     
-                    # Validate values are not NaN or invalid
-                    if not all(isinstance(x, (int, float)) and not (isinstance(x, float) and (x != x or x == float('inf'))) 
-                               for x in [rg_diff, rb_diff, gb_diff]):
+                    # Validate value is not NaN or invalid
+                    if not (isinstance(diff_sum, (int, float)) and not (isinstance(diff_sum, float) and (diff_sum != diff_sum or diff_sum == float('inf')))):
                         raise ValueError("Invalid difference values")
-                    avg_diff = (rg_diff + rb_diff + gb_diff) / 3
+                    avg_diff = diff_sum / 3
                     is_bw = avg_diff < 5  # Threshold for B&W detection
                 except (ValueError, TypeError):
                     # Assume color if we can't determine
@@ -219,19 +336,14 @@ class ImageProcessor:
     def get_image_dimensions(self, img_path):
         """Get image dimensions efficiently."""
         try:
-            if HAS_PYVIPS:
-                import pyvips
-                # new_from_file is lazy and should be fast for just reading headers
-                img = pyvips.Image.new_from_file(str(img_path))
-                return img.width, img.height
-            else:
-                # Fallback to Pillow if available
-                try:
-                    from PIL import Image
-                    with Image.open(img_path) as img:
-                        return img.width, img.height
-                except ImportError:
-                    pass
+            # Common formats: parse the header bytes directly, no decoder involved
+            width, height = _read_image_dimensions_fast(img_path)
+            if width and height:
+                return width, height
+
+            # new_from_file is lazy and should be fast for just reading headers
+            img = pyvips.Image.new_from_file(str(img_path))
+            return img.width, img.height
         except Exception as e:
             print(f"Warning: Could not get dimensions for {img_path}: {e}")
         
@@ -240,9 +352,9 @@ class ImageProcessor:
     def _process_single_image_pyvips(self, img_path, extract_dir, epub_output_folder, central_images_folder, epub_title=None, is_cover=False, image_index=0, is_directory_mode=False):
         """Process a single image using pyvips and save as file."""
         try:
-            import pyvips
-            # Load image with pyvips
-            img = pyvips.Image.new_from_file(str(img_path))
+            # Read the file once: the same bytes are decoded and checksummed below
+            file_content = img_path.read_bytes()
+            img = pyvips.Image.new_from_buffer(file_content, '')
             
             # Resize if needed (maintain aspect ratio, max width 1080)
             # Resizing removed to keep original resolution
@@ -250,40 +362,11 @@ class ImageProcessor:
             #     scale = 1080 / img.width
             #     img = img.resize(scale)
             
-            # Analyze image
-            analysis = self._analyze_image_with_pyvips(img_path)
-            
-            # Convert to AVIF based on analysis
-            if analysis['is_bw']:
-                # Convert to grayscale
-                gray_img = img.colourspace('b-w')
-                
-                # For simple B&W images, use lossless
-                if analysis['complexity'] < 50:
-                    avif_data = gray_img.write_to_buffer('.avif[lossless=true]')
-                    compression_info = "lossless compression"
-                else:
-                    # For complex B&W, use aggressive compression
-                    avif_data = gray_img.write_to_buffer('.avif[Q=35,speed=6]')
-                    compression_info = "35% compression"
-                
-                print(f"Detected B&W image: {img_path.name}, using {compression_info}")
-            else:
-                # Color image - use adaptive quality
-                quality = analysis['complexity']
-                avif_data = img.write_to_buffer(f'.avif[Q={quality},speed=6]')
-                
-                complexity_level = "high" if quality == 85 else "medium" if quality == 80 else "low"
-                print(f"Detected {complexity_level} complexity color image: {img_path.name}, using {quality}% compression")
-            
             # Generate filename based on CRC32 checksum
             # New naming scheme: {crc32}-{index:02d}.avif
             
             # Calculate CRC32 checksum of the original image file
-            import zlib
-            with open(img_path, 'rb') as f:
-                file_content = f.read()
-                crc32_value = zlib.crc32(file_content) & 0xffffffff  # Ensure unsigned 32-bit value
+            crc32_value = zlib.crc32(file_content) & 0xffffffff  # Ensure unsigned 32-bit value
             
             # Generate filename with CRC32
             # Use 02d for padding (01, 02, ... 99, 100)
@@ -300,15 +383,48 @@ class ImageProcessor:
                 output_path = epub_output_folder / output_filename
                 html_path = f"/images/{output_filename}"
             
-            # Save AVIF file
-            with open(output_path, 'wb') as f:
-                f.write(avif_data)
+            if img_path.suffix.lower() == '.avif':
+                # Already in the output format: copy the bytes instead of decoding and
+                # re-encoding, which would only cost time and add generation loss
+                with open(output_path, 'wb') as f:
+                    f.write(file_content)
+                message = f"Copied AVIF image as-is: {img_path.name}"
+            else:
+                # Analyze image
+                analysis = self._analyze_image_with_pyvips(img_path, img)
+            
+                # Convert to AVIF based on analysis and save it. heifsave encodes straight
+                # into the output file, so the encoded image never passes through Python;
+                # effort=3 is the old speed=6 setting.
+                if analysis['is_bw']:
+                    # Convert to grayscale
+                    gray_img = img.colourspace('b-w')
+                
+                    # For simple B&W images, use lossless
+                    if analysis['complexity'] < 50:
+                        gray_img.heifsave(str(output_path), lossless=True, compression='av1')
+                        compression_info = "lossless compression"
+                    else:
+                        # For complex B&W, use aggressive compression
+                        gray_img.heifsave(str(output_path), Q=35, effort=3, compression='av1')
+                        compression_info = "35% compression"
+                
+                    message = f"Detected B&W image: {img_path.name}, using {compression_info}"
+                else:
+                    # Color image - use adaptive quality
+                    quality = analysis['complexity']
+                    img.heifsave(str(output_path), Q=quality, effort=3, compression='av1')
+                
+                    complexity_level = "high" if quality == 85 else "medium" if quality == 80 else "low"
+                    message = f"Detected {complexity_level} complexity color image: {img_path.name}, using {quality}% compression"
             
             # Get relative original path for mapping
             relative_original = unquote(str(img_path.relative_to(extract_dir).as_posix()))
             
-            # Return relative path for use in HTML
+            # Return relative path for use in HTML. The per-image log line is returned
+            # rather than printed so pool threads don't contend for stdout.
             return {
+                'message': message,
                 'relative_original': relative_original,
                 'filename': unquote(img_path.name),
                 'output_filename': output_filename,
@@ -322,6 +438,30 @@ class ImageProcessor:
             print(f"Warning: Could not process image {img_path} with pyvips: {e}")
             return None
 
+    def _find_duplicate_images(self, image_files):
+        """Map each image whose bytes repeat an earlier file's to that earlier file."""
+        by_size = {}
+        for img_path in image_files:
+            try:
+                by_size.setdefault(img_path.stat().st_size, []).append(img_path)
+            except OSError:
+                continue
+        
+        duplicate_of = {}
+        for same_size in by_size.values():
+            if len(same_size) < 2:
+                continue
+            first_by_digest = {}
+            for img_path in same_size:
+                try:
+                    digest = image_digest(img_path.read_bytes())
+                except OSError:
+                    continue
+                first_path = first_by_digest.setdefault(digest, img_path)
+                if first_path is not img_path:
+                    duplicate_of[img_path] = first_path
+        return duplicate_of
+
     def process_images_and_get_mapping(self, image_files, extract_dir, output_folder, epub_title=None, cover_image_path=None, central_images_folder=None, is_directory_mode=False):
         """Process images to AVIF using pyvips and save to disk."""
         path_mapping = {}
@@ -335,10 +475,40 @@ class ImageProcessor:
             if not cover_image.exists() or cover_image not in image_files:
                 cover_image = None
         
+        def record(result):
+            # Add multiple path variations to the mapping for better lookup
+            path_mapping[result['relative_original']] = result['html_path']
+            path_mapping[result['filename']] = result['html_path']
+            
+            # Store metadata
+            image_metadata[result['html_path']] = {
+                'width': result['width'],
+                'height': result['height']
+            }
+            
+            # Also add variations like ../Images/filename
+            path_variation = result['relative_original']
+            if '/' in path_variation:
+                # Add parent directory variant
+                path_mapping[f"../{path_variation}"] = result['html_path']
+                path_mapping[f"{path_variation}"] = result['html_path']
+                path_mapping[f"./{path_variation}"] = result['html_path']
+        
+        # Identical files stored under several paths (repeated ornaments, logos) are
+        # encoded once and the copies point at the first one's output. Only files whose
+        # size matches another file's need hashing. Copies keep their index slot so the
+        # other output names stay the same.
+        duplicate_of = self._find_duplicate_images(image_files)
+        results_by_path = {}
+        
         # Process images with proper naming
-        if len(image_files) <= 4:  # For small numbers of images, process sequentially
+        if len(image_files) - len(duplicate_of) <= 4:  # For small numbers of images, process sequentially
             image_index = 1
             for img_path in image_files:
+                if img_path in duplicate_of:
+                    image_index += 1
+                    continue
+                
                 # Check if this is the cover image
                 is_cover = False
                 if cover_image:
@@ -353,31 +523,19 @@ class ImageProcessor:
                     epub_title, is_cover, image_index, is_directory_mode
                 )
                 if result:
-                    # Add multiple path variations to the mapping for better lookup
-                    path_mapping[result['relative_original']] = result['html_path']
-                    path_mapping[result['filename']] = result['html_path']
-                    
-                    # Store metadata
-                    image_metadata[result['html_path']] = {
-                        'width': result['width'],
-                        'height': result['height']
-                    }
-                    
-                    # Also add variations like ../Images/filename
-                    path_variation = result['relative_original']
-                    if '/' in path_variation:
-                        # Add parent directory variant
-                        path_mapping[f"../{path_variation}"] = result['html_path']
-                        path_mapping[f"{path_variation}"] = result['html_path']
-                        path_mapping[f"./{path_variation}"] = result['html_path']
+                    print(result['message'])
+                    results_by_path[img_path] = result
+                    record(result)
                     image_index += 1
         else:  # For larger numbers of images, use parallel processing
-            print(f"  Processing {len(image_files)} images in parallel using {self.max_workers} workers (pyvips)...")
-            
             # Create a list of image processing tasks with metadata
             image_tasks = []
             image_index = 1
             for img_path in image_files:
+                if img_path in duplicate_of:
+                    image_index += 1
+                    continue
+                
                 # Check if this is the cover image
                 is_cover = False
                 if cover_image:
@@ -390,7 +548,11 @@ class ImageProcessor:
                 image_tasks.append((img_path, is_cover, image_index))
                 image_index += 1
             
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # No more threads than images; each libvips pipeline also runs its own workers
+            workers = min(self.max_workers, len(image_tasks))
+            print(f"  Processing {len(image_tasks)} images in parallel using {workers} workers (pyvips)...")
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
                 # Submit all image processing tasks
                 future_to_task = {
                     executor.submit(
@@ -401,31 +563,33 @@ class ImageProcessor:
                     for task in image_tasks
                 }
                 
-                # Process completed tasks as they finish
+                # Process completed tasks as they finish; their log lines are
+                # written together once the pool is done
+                messages = []
                 for future in as_completed(future_to_task):
                     task = future_to_task[future]
                     img_path = task[0]
                     try:
                         result = future.result()
                         if result:
-                            # Add multiple path variations to the mapping for better lookup
-                            path_mapping[result['relative_original']] = result['html_path']
-                            path_mapping[result['filename']] = result['html_path']
-                            
-                            # Store metadata
-                            image_metadata[result['html_path']] = {
-                                'width': result['width'],
-                                'height': result['height']
-                            }
-                            
-                            # Also add variations like ../Images/filename
-                            path_variation = result['relative_original']
-                            if '/' in path_variation:
-                                # Add parent directory variant
-                                path_mapping[f"../{path_variation}"] = result['html_path']
-                                path_mapping[f"{path_variation}"] = result['html_path']
-                                path_mapping[f"./{path_variation}"] = result['html_path']
+                            messages.append(result['message'])
+                            results_by_path[img_path] = result
+                            record(result)
                     except Exception as e:
-                        print(f"Error processing image {img_path}: {e}")
+                        messages.append(f"Error processing image {img_path}: {e}")
+            if messages:
+                print('\n'.join(messages))
+        
+        # Point every copy at the output of the first file with the same content
+        for img_path, first_path in duplicate_of.items():
+            result = results_by_path.get(first_path)
+            if result:
+                record(dict(
+                    result,
+                    relative_original=unquote(img_path.relative_to(extract_dir).as_posix()),
+                    filename=unquote(img_path.name)
+                ))
+        if duplicate_of:
+            print(f"  Reused {len(duplicate_of)} duplicate image(s) instead of re-encoding")
 
         return path_mapping, image_metadata
@@ -1,5 +1,6 @@
 import os
 import re
+import traceback
 import zipfile
 from pathlib import Path
 from urllib.parse import unquote, urljoin
@@ -12,12 +13,17 @@ except ImportError:
     from xml.etree import ElementTree as ET
     HAS_LXML = False
 
-# Try to import selectolax for faster HTML parsing
+# Try to import selectolax for faster HTML parsing, preferring the Lexbor backend
+# (the Modest backend raises ImportError from selectolax 1.0 on)
 try:
-    from selectolax.parser import HTMLParser
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
     HAS_SELECTOLAX = True
 except ImportError:
-    HAS_SELECTOLAX = False
+    try:
+        from selectolax.parser import HTMLParser
+        HAS_SELECTOLAX = True
+    except ImportError:
+        HAS_SELECTOLAX = False
 
 # Try to import zipfile-deflate64 for faster ZIP extraction
 try:
@@ -27,6 +33,21 @@ except ImportError:
     HAS_ZIPFILE_DEFLATE64 = False
 
 class EPUBParser:
+    # Define patterns for unwanted content (more specific to avoid false positives)
+    unwanted_patterns = [
+        'newsletter signup', 'newsletter sign-up', 'newsletter subscription',
+        'copyright page', 'credits and copyright', 'legal notice',
+        'yen newsletter', 'j-novel club newsletter', 'about j-novel club',
+        'about yen press', 'about publisher', 'publisher information',
+        'legal information', 'terms of service', 'privacy policy',
+        'contact us', 'support page', 'help page', 'advertisement',
+        'promo page', 'promotion page', 'subscribe now', 'subscription page',
+        'sign up page', 'signup page', 'back matter', 'end matter',
+        'colophon', 'imprint', 'newsletter', 'copyright', 'copyrights', 'copyrights and credits', 'Other Series'
+    ]
+
+    _patterns_compiled = False
+
     def __init__(self, temp_dir):
         self.temp_dir = temp_dir
         self.ns = {
@@ -37,26 +58,21 @@ class EPUBParser:
             'epub': 'http://www.idpf.org/2007/ops'
         }
         
-        # Define patterns for unwanted content (more specific to avoid false positives)
-        self.unwanted_patterns = [
-            'newsletter signup', 'newsletter sign-up', 'newsletter subscription',
-            'copyright page', 'credits and copyright', 'legal notice',
-            'yen newsletter', 'j-novel club newsletter', 'about j-novel club',
-            'about yen press', 'about publisher', 'publisher information',
-            'legal information', 'terms of service', 'privacy policy',
-            'contact us', 'support page', 'help page', 'advertisement',
-            'promo page', 'promotion page', 'subscribe now', 'subscription page',
-            'sign up page', 'signup page', 'back matter', 'end matter',
-            'colophon', 'imprint', 'newsletter', 'copyright', 'copyrights', 'copyrights and credits', 'Other Series'
-        ]
-        
         # Pre-compile regex patterns for better performance
         self._compile_regex_patterns()
 
-    def _compile_regex_patterns(self):
-        """Pre-compile all regex patterns for better performance."""
+    @classmethod
+    def _compile_regex_patterns(cls):
+        """Pre-compile all regex patterns for better performance.
+
+        Patterns are stored on the class, so they are compiled once per process
+        (and inherited by forked workers) rather than once per instance.
+        """
+        if cls._patterns_compiled:
+            return
+        
         # Volume number extraction patterns
-        self.volume_patterns = [
+        cls.volume_patterns = [
             re.compile(r'Vol\.?\s*(\d+)', re.IGNORECASE),
             re.compile(r'Volume\s*(\d+)', re.IGNORECASE),
             re.compile(r'v(\d+)', re.IGNORECASE),
@@ -65,14 +81,14 @@ class EPUBParser:
         ]
         
         # Chapter title patterns for basic TOC generation
-        self.chapter_patterns = [
+        cls.chapter_patterns = [
             re.compile(r'Chapter\s+\d+[:\s]*(.*?)(?:\n|$)', re.IGNORECASE),
             re.compile(r'^\s*(\d+)\.\s+(.*?)(?:\n|$)', re.MULTILINE),
             re.compile(r'^\s*(.*?)\s*$', re.MULTILINE)
         ]
         
         # Heading patterns
-        self.heading_patterns = [
+        cls.heading_patterns = [
             re.compile(r'<h1[^>]*>(.*?)</h1>', re.DOTALL | re.IGNORECASE),
             re.compile(r'<h2[^>]*>(.*?)</h2>', re.DOTALL | re.IGNORECASE),
             re.compile(r'<h3[^>]*>(.*?)</h3>', re.DOTALL | re.IGNORECASE),
@@ -82,29 +98,31 @@ class EPUBParser:
         ]
         
         # Title tag pattern
-        self.title_pattern = re.compile(r'<title[^>]*>(.*?)</title>', re.DOTALL | re.IGNORECASE)
+        cls.title_pattern = re.compile(r'<title[^>]*>(.*?)</title>', re.DOTALL | re.IGNORECASE)
         
         # HTML tag removal pattern
-        self.html_tag_pattern = re.compile(r'<[^>]+>')
+        cls.html_tag_pattern = re.compile(r'<[^>]+>')
         
         # Whitespace cleanup pattern
-        self.whitespace_pattern = re.compile(r'\s+')
+        cls.whitespace_pattern = re.compile(r'\s+')
         
         # Filename cleanup patterns
-        self.filename_underscore_pattern = re.compile(r'[_-]')
-        self.filename_digit_pattern = re.compile(r'\d+')
+        cls.filename_underscore_pattern = re.compile(r'[_-]')
+        cls.filename_digit_pattern = re.compile(r'\d+')
         
         # Navigation parsing patterns
-        self.link_pattern = re.compile(r'<a[^>]+href=["\']([^"\']+)["\'][^>]*>(.*?)</a>', re.DOTALL | re.IGNORECASE)
-        self.navpoint_pattern = re.compile(r'<navPoint[^>]*>.*?<navLabel>.*?<text>(.*?)</text>.*?<content[^>]*src=["\']([^"\']+)["\'][^>]*>.*?</navPoint>', re.DOTALL | re.IGNORECASE)
+        cls.link_pattern = re.compile(r'<a[^>]+href=["\']([^"\']+)["\'][^>]*>(.*?)</a>', re.DOTALL | re.IGNORECASE)
+        cls.navpoint_pattern = re.compile(r'<navPoint[^>]*>.*?<navLabel>.*?<text>(.*?)</text>.*?<content[^>]*src=["\']([^"\']+)["\'][^>]*>.*?</navPoint>', re.DOTALL | re.IGNORECASE)
 
         # Compile unwanted content patterns into a single regex for O(1) lookup
         # Sort by length descending to ensure longest matches are tried first
-        sorted_patterns = sorted(self.unwanted_patterns, key=len, reverse=True)
+        sorted_patterns = sorted(cls.unwanted_patterns, key=len, reverse=True)
         # Escape patterns and join with |
         # Use word boundaries \b to match whole words/phrases
         pattern_str = '|'.join(map(re.escape, sorted_patterns))
-        self.unwanted_content_regex = re.compile(rf'\b({pattern_str})\b', re.IGNORECASE)
+        cls.unwanted_content_regex = re.compile(rf'\b({pattern_str})\b', re.IGNORECASE)
+        
+        cls._patterns_compiled = True
 
     def _get_ns_tag(self, tag, ns_key='opf'):
         """Helper to get a namespace-prefixed tag."""
@@ -428,7 +446,6 @@ class EPUBParser:
             
         except Exception as e:
             print(f"Warning: Could not find or parse ToC file: {e}")
-            import traceback
             traceback.print_exc()
             return [], {}, []
 